@@ -0,0 +1,8 @@
+"""The project's ASGI application, with the simulated DB latency."""
+
+from benchmarks import latency
+from library_manage.asgi import application
+
+latency.install()
+
+__all__ = ("application",)
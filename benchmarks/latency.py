@@ -0,0 +1,25 @@
+import os
+import time
+
+from django.db.backends.signals import connection_created
+
+
+def install():
+    """
+    Add BENCHMARK_DB_LATENCY_MS milliseconds to every query, standing
+    in for the round trip to a database on another host.
+    """
+    latency = float(os.getenv("BENCHMARK_DB_LATENCY_MS", 0)) / 1000
+    if not latency:
+        return
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def add_delay(sender, connection, **kwargs):
+        # Fired again each time a thread's connection is reopened.
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(add_delay, weak=False)
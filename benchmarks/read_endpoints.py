@@ -0,0 +1,187 @@
+"""
+Compare the read endpoints served by gunicorn (WSGI, threaded workers,
+synchronous views) and uvicorn (ASGI, ASYNC_READ_VIEWS on) under
+increasing concurrency.
+
+Each server is started in turn on the configured database, warmed up,
+then sent ``--requests`` GETs per path and concurrency level over
+keep-alive connections. Run from the project root:
+
+    python -m benchmarks.read_endpoints --db-latency 20
+
+Needs the dev dependencies (gunicorn, uvicorn, aiohttp) and a migrated
+database with some books in it. Endpoints that need a user take a JWT
+from ``--token``.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+ROW = "| {} | {} | {} | {:.0f} | {:.1f} | {:.1f} | {} |"
+SERVERS = {
+    "wsgi": [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "benchmarks.wsgi:application",
+        "--worker-class",
+        "gthread",
+        "--workers",
+        "{workers}",
+        "--threads",
+        "{threads}",
+        "--bind",
+        "127.0.0.1:{port}",
+        "--log-level",
+        "warning",
+    ],
+    "asgi": [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "benchmarks.asgi:application",
+        "--workers",
+        "{workers}",
+        "--port",
+        "{port}",
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ],
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--path",
+        action="append",
+        dest="paths",
+        help="Endpoint to load, repeatable (default: /api/books/).",
+    )
+    parser.add_argument("--concurrency", default="1,10,50,100")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=8,
+        help="Threads per gunicorn worker.",
+    )
+    parser.add_argument(
+        "--db-latency",
+        type=float,
+        default=0,
+        help="Milliseconds added to every query by the servers.",
+    )
+    parser.add_argument("--token", help="JWT access token for the requests.")
+    parser.add_argument("--port", type=int, default=8765)
+    return parser.parse_args()
+
+
+def start_server(mode, args):
+    command = [
+        part.format(
+            workers=args.workers, threads=args.threads, port=args.port
+        )
+        for part in SERVERS[mode]
+    ]
+    env = {
+        **os.environ,
+        "BENCHMARK_DB_LATENCY_MS": str(args.db_latency),
+        # asgi.py turns the async views on; WSGI keeps them off.
+        "ASYNC_READ_VIEWS": "1" if mode == "asgi" else "",
+    }
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_until_ready(session, url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                return
+        except aiohttp.ClientError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server did not answer on {url}")
+
+
+async def load(session, url, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = []
+
+    async def fetch():
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.get(url) as response:
+                await response.read()
+                statuses.append(response.status)
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(fetch() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    errors = sum(status != 200 for status in statuses)
+    return sorted(timings), elapsed, errors
+
+
+async def run(mode, args, levels):
+    base_url = f"http://127.0.0.1:{args.port}"
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    connector = aiohttp.TCPConnector(limit=max(levels))
+    async with aiohttp.ClientSession(
+        connector=connector, headers=headers
+    ) as session:
+        await wait_until_ready(session, base_url + args.paths[0])
+        rows = []
+        for path in args.paths:
+            url = base_url + path
+            await load(session, url, min(args.requests, 50), 10)
+            for concurrency in levels:
+                timings, elapsed, errors = await load(
+                    session, url, args.requests, concurrency
+                )
+                rows.append(
+                    (
+                        mode,
+                        path,
+                        concurrency,
+                        len(timings) / elapsed,
+                        statistics.median(timings) * 1000,
+                        timings[int(len(timings) * 0.95) - 1] * 1000,
+                        errors,
+                    )
+                )
+        return rows
+
+
+def main():
+    args = parse_args()
+    args.paths = args.paths or ["/api/books/"]
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    print(
+        "| server | path | concurrency | req/s | p50 ms | p95 ms | errors |"
+    )
+    print("|---|---|---:|---:|---:|---:|---:|")
+    for mode in SERVERS:
+        server = start_server(mode, args)
+        try:
+            rows = asyncio.run(run(mode, args, levels))
+        finally:
+            server.terminate()
+            server.wait()
+        for row in rows:
+            print(ROW.format(*row))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from books.models import Book
+from books.models import Book, BookStats
 
 admin.site.register(Book)
+admin.site.register(BookStats)
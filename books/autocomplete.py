@@ -0,0 +1,256 @@
+import logging
+import sys
+import threading
+import uuid
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from books.models import Book
+from books.search import tokenize
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "books:autocomplete:snapshot"
+# Id of the current snapshot, checked on every lookup instead of the
+# snapshot itself, which is the size of the catalog.
+SNAPSHOT_ID_KEY = "books:autocomplete:snapshot-id"
+SEQUENCE_KEY = "books:autocomplete:seq"
+DELTA_KEY = "books:autocomplete:delta:{}"
+SEPARATOR = "\x1f"
+KINDS = ("title", "author")
+MAX_KEYS_PER_LABEL = 8
+# Matches examined per lookup before ranking them by popularity.
+SCAN_LIMIT = 200
+
+
+def get_label_keys(label):
+    """Lookup keys of a label: the label from each of its word starts."""
+    words = tokenize(label)[:MAX_KEYS_PER_LABEL]
+    return [" ".join(words[index:]) for index in range(len(words))]
+
+
+class PrefixIndex:
+    """
+    Sorted array of ``key, kind, label`` strings searched with bisect.
+
+    ``counts`` holds how many books share a label; it ranks suggestions
+    and tells when the last book using a label is gone. Labels that
+    would push the estimated size over ``max_bytes`` are not indexed.
+    """
+
+    def __init__(self, counts=None, entries=None, max_bytes=None):
+        self.max_bytes = max_bytes or settings.BOOK_AUTOCOMPLETE_MAX_BYTES
+        self.counts = {}
+        self.entries = []
+        self.size = 0
+        if entries is not None:
+            self.counts = counts
+            self.entries = entries
+            self.size = sum(map(self._entry_size, entries))
+        elif counts:
+            self._build(counts)
+
+    @staticmethod
+    def _entry_size(entry):
+        return sys.getsizeof(entry) + 8
+
+    @staticmethod
+    def _entries(kind, label):
+        return [
+            SEPARATOR.join((key, kind, label))
+            for key in get_label_keys(label)
+        ]
+
+    def _build(self, counts):
+        # Most popular labels first, so the budget keeps the useful ones.
+        for (kind, label), count in sorted(
+            counts.items(), key=lambda item: -item[1]
+        ):
+            entries = self._entries(kind, label)
+            size = sum(map(self._entry_size, entries))
+            if self.size + size > self.max_bytes:
+                continue
+            self.counts[kind, label] = count
+            self.entries.extend(entries)
+            self.size += size
+        self.entries.sort()
+
+    def apply(self, kind, label, delta):
+        count = self.counts.get((kind, label), 0)
+        if count:
+            if count + delta > 0:
+                self.counts[kind, label] = count + delta
+                return
+            del self.counts[kind, label]
+            for entry in self._entries(kind, label):
+                position = bisect_left(self.entries, entry)
+                if (
+                    position < len(self.entries)
+                    and self.entries[position] == entry
+                ):
+                    del self.entries[position]
+                    self.size -= self._entry_size(entry)
+        elif delta > 0:
+            entries = self._entries(kind, label)
+            size = sum(map(self._entry_size, entries))
+            if self.size + size > self.max_bytes:
+                logger.warning("Autocomplete index is over its memory budget")
+                return
+            self.counts[kind, label] = delta
+            for entry in entries:
+                insort(self.entries, entry)
+            self.size += size
+
+    def suggest(self, prefix, limit):
+        prefix = " ".join(tokenize(prefix))
+        if not prefix:
+            return []
+
+        found = {}
+        position = bisect_left(self.entries, prefix)
+        for entry in self.entries[position:position + SCAN_LIMIT]:
+            if not entry.startswith(prefix):
+                break
+            _, kind, label = entry.split(SEPARATOR)
+            found[kind, label] = self.counts.get((kind, label), 0)
+
+        ranked = sorted(found.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            {"text": label, "type": kind} for (kind, label), _ in ranked
+        ][:limit]
+
+
+def count_labels():
+    counts = {}
+    rows = Book.objects.values_list("title", "author").iterator(
+        chunk_size=5000
+    )
+    for row in rows:
+        for kind, label in zip(KINDS, row):
+            counts[kind, label] = counts.get((kind, label), 0) + 1
+    return counts
+
+
+def build_snapshot():
+    """
+    Build the index from the database and share it through the cache,
+    together with the delta sequence number it already includes.
+    """
+    cache.add(SEQUENCE_KEY, 0, timeout=None)
+    sequence = cache.get(SEQUENCE_KEY, 0)
+    index = PrefixIndex(count_labels())
+    snapshot = {
+        "id": uuid.uuid4().hex,
+        "sequence": sequence,
+        "counts": index.counts,
+        "entries": index.entries,
+    }
+    cache.set(
+        SNAPSHOT_KEY,
+        snapshot,
+        timeout=settings.BOOK_AUTOCOMPLETE_SNAPSHOT_TIMEOUT,
+    )
+    # Published after the snapshot, so a process that sees the id can
+    # fetch the snapshot it names.
+    cache.set(
+        SNAPSHOT_ID_KEY,
+        snapshot["id"],
+        timeout=settings.BOOK_AUTOCOMPLETE_SNAPSHOT_TIMEOUT,
+    )
+    return snapshot, index
+
+
+_index = None
+_snapshot_id = None
+_sequence = 0
+_index_lock = threading.Lock()
+
+
+def _use_snapshot(snapshot, index=None):
+    global _index, _snapshot_id, _sequence
+    _index = index or PrefixIndex(snapshot["counts"], snapshot["entries"])
+    _snapshot_id = snapshot["id"]
+    _sequence = snapshot["sequence"]
+
+
+def get_autocomplete_index():
+    """
+    Return this process' copy of the shared index.
+
+    A process loads the snapshot from the cache (building it if nobody
+    has yet) and then replays the deltas published by ``Book`` signals
+    in any process. A lost delta or a replaced snapshot reloads it. Only
+    the snapshot id and the sequence number are read per lookup.
+    """
+    global _sequence
+    with _index_lock:
+        shared = cache.get_many((SNAPSHOT_ID_KEY, SEQUENCE_KEY))
+        sequence = shared.get(SEQUENCE_KEY, 0)
+        snapshot_id = shared.get(SNAPSHOT_ID_KEY)
+        if snapshot_id is None or snapshot_id != _snapshot_id:
+            snapshot = snapshot_id and cache.get(SNAPSHOT_KEY)
+            if snapshot:
+                _use_snapshot(snapshot)
+            else:
+                _use_snapshot(*build_snapshot())
+            sequence = cache.get(SEQUENCE_KEY, 0)
+
+        if sequence == _sequence:
+            return _index
+
+        keys = [
+            DELTA_KEY.format(number)
+            for number in range(_sequence + 1, sequence + 1)
+        ]
+        deltas = cache.get_many(keys)
+        if sequence < _sequence or len(deltas) < len(keys):
+            _use_snapshot(*build_snapshot())
+            return _index
+
+        for key in keys:
+            for kind, label, delta in deltas[key]:
+                _index.apply(kind, label, delta)
+        _sequence = sequence
+        return _index
+
+
+def publish_delta(changes):
+    if not changes:
+        return
+    cache.add(SEQUENCE_KEY, 0, timeout=None)
+    sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(
+        DELTA_KEY.format(sequence),
+        changes,
+        timeout=settings.BOOK_AUTOCOMPLETE_SNAPSHOT_TIMEOUT,
+    )
+
+
+def get_label_changes(old, new):
+    changes = []
+    for kind, old_label, new_label in zip(KINDS, old, new):
+        if old_label == new_label:
+            continue
+        if old_label is not None:
+            changes.append((kind, old_label, -1))
+        if new_label is not None:
+            changes.append((kind, new_label, 1))
+    return changes
+
+
+def record_book_change(old, new):
+    """
+    Publish the label changes between two ``(title, author)`` pairs once
+    the transaction commits; ``None`` stands for a missing book.
+    """
+    changes = get_label_changes(old or (None, None), new or (None, None))
+    transaction.on_commit(lambda: publish_delta(changes))
+
+
+def invalidate_autocomplete():
+    """Make every process rebuild the index, e.g. after a bulk import."""
+    # Processes only compare the id, so it has to go with the snapshot.
+    cache.delete_many((SNAPSHOT_ID_KEY, SNAPSHOT_KEY))
@@ -0,0 +1,186 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from library_manage.conditional import (
+    get_not_modified_response,
+    make_etag,
+    set_validators,
+)
+
+CATALOG_VERSION_KEY = "books:catalog-version"
+CACHE_HITS_KEY = "books:cache-hits"
+CACHE_MISSES_KEY = "books:cache-misses"
+CACHED_HEADERS = ("Link",)
+
+
+def _new_catalog_version():
+    # Seeded from the clock so that a lost counter never reuses a version
+    # whose responses might still be cached.
+    return time.time_ns() // 1000
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _new_catalog_version(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def aget_catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(
+            CATALOG_VERSION_KEY, _new_catalog_version(), timeout=None
+        )
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        version = _new_catalog_version()
+        cache.set(CATALOG_VERSION_KEY, version, timeout=None)
+        return version
+
+
+def invalidate_catalog():
+    """Drop cached catalog responses once the current transaction commits."""
+    transaction.on_commit(bump_catalog_version)
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+async def _acount(key):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key)
+
+
+def get_cache_stats():
+    stats = cache.get_many((CACHE_HITS_KEY, CACHE_MISSES_KEY))
+    hits = stats.get(CACHE_HITS_KEY, 0)
+    misses = stats.get(CACHE_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+        "catalog_version": get_catalog_version(),
+    }
+
+
+class CatalogCacheMixin:
+    """
+    Cache list and detail responses of the catalog under the current
+    catalog version, so no explicit key deletion is ever needed.
+    The version doubles as the ETag, so a revalidating client gets a 304
+    without touching the cache entry or the database.
+    Permissions are checked before the cache is consulted.
+    """
+
+    def get_catalog_cache_key(self, request, version):
+        url = request.build_absolute_uri()
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return f"books:response:{version}:{self.action}:{digest}"
+
+    def get_catalog_etag(self, request, version):
+        return make_etag(
+            request.get_full_path(), request.accepted_media_type, version
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        version = get_catalog_version()
+        etag = self.get_catalog_etag(request, version)
+        not_modified = get_not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        key = self.get_catalog_cache_key(request, version)
+        cached = cache.get(key)
+        if cached is not None:
+            _count(CACHE_HITS_KEY)
+            data, headers = cached
+            return set_validators(Response(data, headers=headers), etag)
+
+        _count(CACHE_MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        return self._cache_response(key, response, etag)
+
+    async def aget_cached_response(self, handler, request, *args, **kwargs):
+        version = await aget_catalog_version()
+        etag = self.get_catalog_etag(request, version)
+        not_modified = get_not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        key = self.get_catalog_cache_key(request, version)
+        cached = await cache.aget(key)
+        if cached is not None:
+            await _acount(CACHE_HITS_KEY)
+            data, headers = cached
+            return set_validators(Response(data, headers=headers), etag)
+
+        await _acount(CACHE_MISSES_KEY)
+        response = await handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(
+                key,
+                self._get_cache_entry(response),
+                timeout=settings.CATALOG_CACHE_TIMEOUT,
+            )
+            set_validators(response, etag)
+        return response
+
+    def _get_cache_entry(self, response):
+        headers = {
+            header: response[header]
+            for header in CACHED_HEADERS
+            if response.has_header(header)
+        }
+        return response.data, headers
+
+    def _cache_response(self, key, response, etag):
+        if response.status_code == 200:
+            cache.set(
+                key,
+                self._get_cache_entry(response),
+                timeout=settings.CATALOG_CACHE_TIMEOUT,
+            )
+            set_validators(response, etag)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aget_cached_response(
+            super().alist, request, *args, **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aget_cached_response(
+            super().aretrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from rest_framework import serializers
+
+from books.autocomplete import invalidate_autocomplete
+from books.cache import invalidate_catalog
+from books.models import Book
+from books.search import bump_search_version
+from books.serializers import BookSerializer
+from library_manage.streaming import chunked
+
+CATALOG_FIELDS = ("id", "title", "author", "cover", "inventory", "daily_fee")
+UPDATE_FIELDS = (
+    "title",
+    "author",
+    "cover",
+    "inventory",
+    "daily_fee",
+    "updated_at",
+)
+MAX_REPORTED_ERRORS = 100
+
+
+class BookImportSerializer(BookSerializer):
+    id = serializers.IntegerField(min_value=1, required=False)
+
+
+def export_catalog_rows():
+    return (
+        Book.objects.order_by("id")
+        .values_list(*CATALOG_FIELDS)
+        .iterator(chunk_size=settings.STREAMING_EXPORT_CHUNK_SIZE)
+    )
+
+
+def import_catalog(records, batch_size=None, using="default"):
+    """
+    Validate ``(line number, record)`` pairs in chunks and upsert the
+    valid ones by id, one ``INSERT ... ON CONFLICT`` per chunk. Records
+    without an id are inserted. Returns the number of rows written and
+    the first validation errors.
+    """
+    batch_size = batch_size or settings.CATALOG_IMPORT_BATCH_SIZE
+    imported = 0
+    errors = []
+
+    for chunk in chunked(records, batch_size):
+        books = []
+        for line_number, record in chunk:
+            if record is not None and record.get("id") in ("", None):
+                record.pop("id", None)
+            serializer = BookImportSerializer(data=record or {})
+            if record is None or not serializer.is_valid():
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(
+                        {
+                            "line": line_number,
+                            "errors": (
+                                serializer.errors
+                                if record is not None
+                                else "Not a JSON object."
+                            ),
+                        }
+                    )
+                continue
+            books.append(Book(**serializer.validated_data))
+
+        with transaction.atomic(using=using):
+            upserts = [book for book in books if book.id is not None]
+            inserts = [book for book in books if book.id is None]
+            if upserts:
+                Book.objects.using(using).bulk_create(
+                    upserts,
+                    update_conflicts=True,
+                    unique_fields=("id",),
+                    update_fields=UPDATE_FIELDS,
+                )
+            if inserts:
+                Book.objects.using(using).bulk_create(inserts)
+        imported += len(books)
+
+    if imported:
+        _after_import(using)
+    return imported, errors
+
+
+def _after_import(using):
+    # bulk_create skips signals, and explicit ids do not advance the
+    # primary key sequence on PostgreSQL.
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Book]):
+            cursor.execute(sql)
+    invalidate_catalog()
+    transaction.on_commit(bump_search_version, using=using)
+    transaction.on_commit(invalidate_autocomplete, using=using)
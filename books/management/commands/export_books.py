@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from books.catalog import CATALOG_FIELDS, export_catalog_rows
+from library_manage.streaming import (
+    FORMATS,
+    get_file_format,
+    iter_csv,
+    iter_ndjson,
+)
+
+
+class Command(BaseCommand):
+    help = "Stream the whole catalog to a CSV or NDJSON file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-")
+        parser.add_argument("--format", choices=FORMATS, dest="file_format")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = get_file_format(options["file_format"], path)
+        iter_lines = iter_csv if file_format == "csv" else iter_ndjson
+        lines = iter_lines(CATALOG_FIELDS, export_catalog_rows())
+
+        if path == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        with open(path, "w", encoding="utf-8", newline="") as stream:
+            stream.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f"Exported catalog to {path}"))
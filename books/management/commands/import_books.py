@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from books.catalog import import_catalog
+from library_manage.streaming import FORMATS, get_file_format, iter_records
+
+
+class Command(BaseCommand):
+    help = "Upsert books from a CSV or NDJSON file, matching rows by id."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, dest="file_format")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = get_file_format(options["file_format"], path)
+
+        try:
+            stream = open(path, "rb")
+        except OSError as error:
+            raise CommandError(error)
+
+        with stream:
+            imported, errors = import_catalog(
+                iter_records(stream, file_format),
+                batch_size=options["batch_size"],
+                using=options["database"],
+            )
+
+        for error in errors:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {imported} books from {path}")
+        )
@@ -1,4 +1,11 @@
-from django.db import models
+from functools import reduce
+from operator import or_
+
+from django.db import models, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from books.cache import invalidate_catalog
 
 
 class Book(models.Model):
@@ -11,6 +18,91 @@ class Book(models.Model):
     cover = models.CharField(max_length=50, choices=CoverChoices.choices)
     inventory = models.PositiveIntegerField()
     daily_fee = models.DecimalField(max_digits=8, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Book: {self.title}, author: {self.author}"
+
+    @staticmethod
+    def reserve_copy(book_id) -> bool:
+        """
+        Take one copy off the shelf with a single conditional UPDATE.
+        Returns False when no copies are left.
+        """
+        reserved = Book.objects.filter(pk=book_id, inventory__gt=0).update(
+            inventory=F("inventory") - 1, updated_at=timezone.now()
+        )
+        if reserved:
+            invalidate_catalog()
+        return bool(reserved)
+
+    @staticmethod
+    def reserve_copies(counts) -> bool:
+        """
+        Take ``counts[book_id]`` copies of several books with one
+        ``UPDATE ... CASE``. Nothing is taken unless every book has enough
+        copies left.
+        """
+        guard = reduce(
+            or_,
+            (
+                Q(pk=book_id, inventory__gte=count)
+                for book_id, count in counts.items()
+            ),
+        )
+        inventory = Case(
+            *(
+                When(pk=book_id, then=F("inventory") - count)
+                for book_id, count in counts.items()
+            ),
+            default=F("inventory"),
+            output_field=models.PositiveIntegerField(),
+        )
+        with transaction.atomic():
+            reserved = Book.objects.filter(guard).update(
+                inventory=inventory, updated_at=timezone.now()
+            )
+            if reserved != len(counts):
+                transaction.set_rollback(True)
+                return False
+        invalidate_catalog()
+        return True
+
+    @staticmethod
+    def release_copies(counts):
+        inventory = Case(
+            *(
+                When(pk=book_id, then=F("inventory") + count)
+                for book_id, count in counts.items()
+            ),
+            default=F("inventory"),
+            output_field=models.PositiveIntegerField(),
+        )
+        Book.objects.filter(pk__in=counts).update(
+            inventory=inventory, updated_at=timezone.now()
+        )
+        invalidate_catalog()
+
+    @staticmethod
+    def release_copy(book_id):
+        Book.release_copies({book_id: 1})
+
+
+class BookStats(models.Model):
+    """
+    Loan counters of a book, kept beside it so catalog pages need no
+    aggregation over borrowings. Maintained by borrowings.stats and
+    rebuilt by the reconcile_book_stats command.
+    """
+
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    active_loans = models.IntegerField(default=0)
+    overdue_loans = models.IntegerField(default=0)
+    total_loans = models.IntegerField(default=0)
+    next_due_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats of book #{self.book_id}"
@@ -0,0 +1,13 @@
+from library_manage.pagination import KeysetPagination
+
+
+class BookPagination(KeysetPagination):
+    ordering = ("id",)
+    search_ordering = ("-rank", "id")
+    page_size = 50
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        if "rank" in queryset.query.annotations:
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,225 @@
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import (
+    Case,
+    FloatField,
+    IntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Greatest
+
+from books.models import Book
+
+SEARCH_VERSION_KEY = "books:search-version"
+TOKEN_RE = re.compile(r"\w+")
+MAX_QUERY_TERMS = 8
+# Ranks are scaled to integers so they survive a round trip through the
+# pagination cursor exactly.
+RANK_SCALE = 10**6
+
+SEARCH_VECTOR = SearchVector("title", "author", config="simple")
+
+# PostgreSQL only, created by create_search_indexes after migrate.
+SEARCH_INDEXES = (
+    GinIndex(SEARCH_VECTOR, name="book_search_idx"),
+    GinIndex(
+        OpClass("title", name="gin_trgm_ops"), name="book_title_trgm_idx"
+    ),
+    GinIndex(
+        OpClass("author", name="gin_trgm_ops"), name="book_author_trgm_idx"
+    ),
+)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def search_books(queryset, query):
+    """
+    Filter ``queryset`` down to books whose title or author match every
+    term of ``query`` and annotate them with an integer ``rank``.
+    The last term also matches as a prefix.
+    """
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return queryset.none()
+    if connections[queryset.db].vendor == "postgresql":
+        return _search_postgresql(queryset, terms, query)
+    return _search_inverted_index(queryset, terms)
+
+
+def _search_postgresql(queryset, terms, query):
+    *words, last = terms
+    if len(last) >= settings.BOOK_SEARCH_MIN_PREFIX:
+        last = f"{last}:*"
+    search_query = SearchQuery(
+        " & ".join([*words, last]), search_type="raw", config="simple"
+    )
+    score = SearchRank(SEARCH_VECTOR, search_query) + Greatest(
+        TrigramWordSimilarity(query, "title"),
+        TrigramWordSimilarity(query, "author"),
+    )
+    return (
+        queryset.alias(search=SEARCH_VECTOR)
+        .filter(
+            Q(search=search_query)
+            | Q(title__trigram_word_similar=query)
+            | Q(author__trigram_word_similar=query)
+        )
+        .annotate(
+            rank=Cast(
+                Cast(score, FloatField()) * RANK_SCALE, IntegerField()
+            )
+        )
+    )
+
+
+def _search_inverted_index(queryset, terms):
+    matches = get_inverted_index().search(
+        terms, settings.BOOK_SEARCH_MAX_RESULTS
+    )
+    if not matches:
+        return queryset.none()
+    book_ids = [book_id for book_id, _ in matches]
+    return queryset.filter(id__in=book_ids).annotate(
+        rank=Case(
+            *(
+                When(id=book_id, then=Value(score))
+                for book_id, score in matches
+            ),
+            output_field=IntegerField(),
+        )
+    )
+
+
+class InvertedIndex:
+    """
+    Term -> book ids postings with a sorted term list for prefix lookups.
+    Used where the database has no full-text search of its own.
+    """
+
+    TITLE_WEIGHT = 2
+    AUTHOR_WEIGHT = 1
+
+    def __init__(self, rows=()):
+        self.postings = defaultdict(dict)
+        for book_id, title, author in rows:
+            for field, weight in (
+                (title, self.TITLE_WEIGHT),
+                (author, self.AUTHOR_WEIGHT),
+            ):
+                for term in tokenize(field):
+                    postings = self.postings[term]
+                    postings[book_id] = max(postings.get(book_id, 0), weight)
+        self.terms = sorted(self.postings)
+
+    def _expand(self, prefix):
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + "\uffff", lo=start)
+        return self.terms[start:end]
+
+    def search(self, terms, limit):
+        *words, last = terms
+        if len(last) >= settings.BOOK_SEARCH_MIN_PREFIX:
+            last_candidates = self._expand(last)
+        else:
+            last_candidates = [last]
+
+        scores = None
+        for term, candidates in [(word, [word]) for word in words] + [
+            (last, last_candidates)
+        ]:
+            term_scores = {}
+            for candidate in candidates:
+                # Exact matches outrank prefix matches.
+                bonus = RANK_SCALE if candidate == term else RANK_SCALE // 2
+                for book_id, weight in self.postings.get(
+                    candidate, {}
+                ).items():
+                    term_scores[book_id] = max(
+                        term_scores.get(book_id, 0), weight * bonus
+                    )
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    book_id: score + term_scores[book_id]
+                    for book_id, score in scores.items()
+                    if book_id in term_scores
+                }
+            if not scores:
+                return []
+        return heapq.nlargest(
+            limit, scores.items(), key=lambda item: (item[1], -item[0])
+        )
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_search_version():
+    version = cache.get(SEARCH_VERSION_KEY)
+    if version is None:
+        cache.add(SEARCH_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(SEARCH_VERSION_KEY)
+    return version
+
+
+def bump_search_version():
+    try:
+        cache.incr(SEARCH_VERSION_KEY)
+    except ValueError:
+        cache.set(SEARCH_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+
+
+def get_inverted_index():
+    """
+    Return this process' index, rebuilding it when a title or author was
+    changed anywhere since it was built.
+    """
+    global _index, _index_version
+    version = get_search_version()
+    with _index_lock:
+        if _index is None or _index_version != version:
+            _index = InvertedIndex(
+                Book.objects.values_list("id", "title", "author").iterator(
+                    chunk_size=5000
+                )
+            )
+            _index_version = version
+        return _index
+
+
+def create_search_indexes(using="default", **kwargs):
+    db = connections[using]
+    if db.vendor != "postgresql":
+        return
+
+    table = Book._meta.db_table
+    with db.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        existing = db.introspection.get_constraints(cursor, table)
+    with db.schema_editor() as schema_editor:
+        for index in SEARCH_INDEXES:
+            if index.name not in existing:
+                schema_editor.add_index(Book, index)
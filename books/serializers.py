@@ -1,9 +1,44 @@
+from datetime import date
+from typing import Optional
+
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
 
-from books.models import Book
+from books.models import Book, BookStats
 
 
 class BookSerializer(serializers.ModelSerializer):
+    active_loans = serializers.SerializerMethodField()
+    overdue_loans = serializers.SerializerMethodField()
+    next_due_date = serializers.SerializerMethodField()
+
     class Meta:
         model = Book
-        fields = ("id", "title", "author", "cover", "inventory", "daily_fee")
+        fields = (
+            "id",
+            "title",
+            "author",
+            "cover",
+            "inventory",
+            "daily_fee",
+            "active_loans",
+            "overdue_loans",
+            "next_due_date",
+        )
+
+    @staticmethod
+    def _get_stats(book):
+        # Books that were never borrowed have no stats row yet.
+        try:
+            return book.stats
+        except ObjectDoesNotExist:
+            return BookStats(book=book)
+
+    def get_active_loans(self, book) -> int:
+        return self._get_stats(book).active_loans
+
+    def get_overdue_loans(self, book) -> int:
+        return self._get_stats(book).overdue_loans
+
+    def get_next_due_date(self, book) -> Optional[date]:
+        return self._get_stats(book).next_due_date
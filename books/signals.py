@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from books.autocomplete import record_book_change
+from books.cache import invalidate_catalog
+from books.models import Book
+from books.search import bump_search_version
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_catalog_on_change(sender, **kwargs):
+    invalidate_catalog()
+    transaction.on_commit(bump_search_version)
+
+
+def _get_labels(book):
+    # Read from __dict__ so deferred fields are not loaded.
+    return book.__dict__.get("title"), book.__dict__.get("author")
+
+
+@receiver(post_init, sender=Book)
+def remember_autocomplete_labels(sender, instance, **kwargs):
+    instance._autocomplete_labels = _get_labels(instance)
+
+
+@receiver(post_save, sender=Book)
+def update_autocomplete_on_save(sender, instance, created, **kwargs):
+    labels = _get_labels(instance)
+    record_book_change(
+        None if created else instance._autocomplete_labels, labels
+    )
+    instance._autocomplete_labels = labels
+
+
+@receiver(post_delete, sender=Book)
+def update_autocomplete_on_delete(sender, instance, **kwargs):
+    record_book_change(instance._autocomplete_labels, None)
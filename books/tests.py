@@ -1,15 +1,44 @@
+import json
+import os
+import tempfile
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+import msgpack
+import orjson
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
+from books.autocomplete import SNAPSHOT_KEY, PrefixIndex
+from books.catalog import import_catalog
 from books.models import Book
 from books.serializers import BookSerializer
+from books.views import AsyncBookListView, BookViewSet
+from library_manage.db_routers import (
+    PrimaryReplicaRouter,
+    read_from_replica,
+    replica_reads_enabled,
+)
+from library_manage.renderers import ORJSONParser, ORJSONRenderer
 
 
 class BaseBookAPITest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.book_1 = Book.objects.create(
             title="Book Test",
@@ -38,7 +67,45 @@ class UnAuthenticatedBooksApiTest(BaseBookAPITest):
         books = Book.objects.all()
         serializer = BookSerializer(books, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, response.data)
+        self.assertEqual(serializer.data, response.data["results"])
+
+    def test_books_list_is_paginated_by_keyset(self):
+        for index in range(4):
+            Book.objects.create(
+                title=f"Paged Book {index}",
+                author="Author Test",
+                cover="SOFT",
+                inventory=1,
+                daily_fee=1,
+            )
+
+        first_page = self.client.get(self.book_list_url, {"page_size": 2})
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first_page.data["results"]), 2)
+        self.assertIsNone(first_page.data["previous"])
+        self.assertIn('rel="next"', first_page["Link"])
+
+        seen_ids = [book["id"] for book in first_page.data["results"]]
+        next_url = first_page.data["next"]
+        while next_url:
+            page = self.client.get(next_url)
+            seen_ids.extend(book["id"] for book in page.data["results"])
+            next_url = page.data["next"]
+
+        self.assertEqual(
+            seen_ids,
+            list(Book.objects.order_by("id").values_list("id", flat=True)),
+        )
+
+        last_page = self.client.get(page.data["previous"])
+        self.assertEqual(
+            [book["id"] for book in last_page.data["results"]],
+            seen_ids[2:4],
+        )
+
+    def test_invalid_cursor_returns_not_found(self):
+        response = self.client.get(self.book_list_url, {"cursor": "bogus"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_get_book_detail_unauthorized(self):
         response = self.client.get(self.book_detail_url)
@@ -83,3 +150,414 @@ class AdminBookAPITest(BaseBookAPITest):
     def test_delete_book_admin(self):
         response = self.client.delete(self.book_detail_url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class ReplicaRoutingTest(BaseBookAPITest):
+    @mock.patch(
+        "library_manage.db_routers.get_replica_aliases",
+        return_value=["replica_1"],
+    )
+    def test_reads_use_replica_only_when_requested(self, _):
+        router = PrimaryReplicaRouter()
+
+        self.assertIsNone(router.db_for_read(Book))
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Book), "replica_1")
+            self.assertEqual(router.db_for_write(Book), "default")
+        self.assertIsNone(router.db_for_read(Book))
+
+    def test_catalog_list_is_read_from_replica(self):
+        list_view = BookViewSet.list
+        replica_flags = []
+
+        def spy(view, request, *args, **kwargs):
+            replica_flags.append(replica_reads_enabled())
+            return list_view(view, request, *args, **kwargs)
+
+        with mock.patch.object(BookViewSet, "list", spy):
+            response = self.client.get(self.book_list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(replica_flags, [True])
+        self.assertFalse(replica_reads_enabled())
+
+
+class AsyncBookListTest(BaseBookAPITest):
+    async def test_async_list_matches_sync_list(self):
+        sync_response = await sync_to_async(self.client.get)(
+            self.book_list_url, {"search": "book"}
+        )
+        await cache.aclear()
+        request = AsyncRequestFactory().get(
+            self.book_list_url, {"search": "book"}
+        )
+        replica_flags = []
+        aget_list_queryset = AsyncBookListView.aget_list_queryset
+
+        async def spy(view):
+            replica_flags.append(replica_reads_enabled())
+            return await aget_list_queryset(view)
+
+        with mock.patch.object(AsyncBookListView, "aget_list_queryset", spy):
+            response = await AsyncBookListView.as_view()(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, sync_response.data)
+        self.assertEqual(replica_flags, [True])
+
+
+class CatalogCacheTest(BaseBookAPITest):
+    def test_repeated_list_is_served_from_cache(self):
+        first = self.client.get(self.book_list_url)
+
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(self.book_list_url)
+
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(first.data, second.data)
+
+    def test_book_save_invalidates_cached_list(self):
+        self.client.get(self.book_list_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book_1.title = "Renamed Book"
+            self.book_1.save()
+        response = self.client.get(self.book_list_url)
+
+        self.assertEqual(response.data["results"][0]["title"], "Renamed Book")
+
+    def test_inventory_change_invalidates_cached_list(self):
+        self.client.get(self.book_list_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.reserve_copy(self.book_1.id)
+        response = self.client.get(self.book_list_url)
+
+        self.assertEqual(response.data["results"][0]["inventory"], 2)
+
+    def test_cache_stats_are_exposed_to_admins(self):
+        self.client.get(self.book_list_url)
+        self.client.get(self.book_list_url)
+        admin = get_user_model().objects.create_user(
+            email="stats@admin.com", password="1qazcde3", is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get(reverse("books:book-cache-stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["hits"], 1)
+        self.assertEqual(response.data["misses"], 1)
+
+
+class CatalogConditionalGetTest(BaseBookAPITest):
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.book_list_url)["ETag"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                self.book_list_url, HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_catalog_change_changes_etag(self):
+        etag = self.client.get(self.book_list_url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.reserve_copy(self.book_1.id)
+        response = self.client.get(self.book_list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class BookSearchTest(BaseBookAPITest):
+    def setUp(self):
+        super().setUp()
+        for title, author in (
+            ("The Hobbit", "J. R. R. Tolkien"),
+            ("Tolkien: A Biography", "Humphrey Carpenter"),
+            ("Dune", "Frank Herbert"),
+        ):
+            Book.objects.create(
+                title=title,
+                author=author,
+                cover="SOFT",
+                inventory=1,
+                daily_fee=1,
+            )
+
+    def search(self, query, **params):
+        return self.client.get(
+            self.book_list_url, {"search": query, **params}
+        )
+
+    def test_title_matches_rank_above_author_matches(self):
+        response = self.search("tolkien")
+
+        self.assertEqual(
+            [book["title"] for book in response.data["results"]],
+            ["Tolkien: A Biography", "The Hobbit"],
+        )
+
+    def test_last_term_matches_as_prefix(self):
+        response = self.search("tolkien hob")
+
+        self.assertEqual(
+            [book["title"] for book in response.data["results"]],
+            ["The Hobbit"],
+        )
+
+    def test_search_results_are_paginated_by_rank(self):
+        first_page = self.search("tolkien", page_size=1)
+        second_page = self.client.get(first_page.data["next"])
+
+        self.assertEqual(
+            second_page.data["results"][0]["title"], "The Hobbit"
+        )
+        self.assertIsNone(second_page.data["next"])
+
+    def test_index_follows_catalog_changes(self):
+        self.search("dune")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(title="Dune").get().delete()
+
+        self.assertEqual(self.search("dune").data["results"], [])
+
+
+class BookAutocompleteTest(BaseBookAPITest):
+    def setUp(self):
+        super().setUp()
+        self.autocomplete_url = reverse("books:book-autocomplete")
+        for title in ("The Hobbit", "Hobbit Recipes"):
+            Book.objects.create(
+                title=title,
+                author="Author Test",
+                cover="SOFT",
+                inventory=1,
+                daily_fee=1,
+            )
+
+    def suggest(self, prefix):
+        response = self.client.get(self.autocomplete_url, {"q": prefix})
+        return [
+            (item["type"], item["text"]) for item in response.data["results"]
+        ]
+
+    def test_suggestions_match_any_word_start(self):
+        self.assertEqual(
+            self.suggest("hob"),
+            [("title", "Hobbit Recipes"), ("title", "The Hobbit")],
+        )
+
+    def test_popular_labels_come_first(self):
+        self.assertEqual(self.suggest("auth")[0], ("author", "Author Test"))
+
+    def test_lookup_does_not_query_the_database(self):
+        self.suggest("hob")
+
+        with CaptureQueriesContext(connection) as context:
+            self.suggest("the")
+
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_lookup_does_not_fetch_the_snapshot_again(self):
+        self.suggest("hob")
+
+        with mock.patch(
+            "books.autocomplete.cache.get", wraps=cache.get
+        ) as get:
+            self.suggest("the")
+
+        self.assertNotIn(
+            mock.call(SNAPSHOT_KEY), get.call_args_list
+        )
+
+    def test_book_changes_are_applied_incrementally(self):
+        self.suggest("hob")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book_1.title = "Hobgoblins"
+            self.book_1.save()
+            Book.objects.get(title="The Hobbit").delete()
+
+        with CaptureQueriesContext(connection) as context:
+            suggestions = self.suggest("hob")
+
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(
+            suggestions,
+            [("title", "Hobbit Recipes"), ("title", "Hobgoblins")],
+        )
+        self.assertEqual(self.suggest("book test"), [])
+
+    def test_imported_books_are_suggested(self):
+        self.suggest("hob")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_catalog(
+                [
+                    (
+                        2,
+                        {
+                            "title": "Hobbit Atlas",
+                            "author": "Author Test",
+                            "cover": "SOFT",
+                            "inventory": 1,
+                            "daily_fee": 1,
+                        },
+                    )
+                ]
+            )
+
+        self.assertIn(("title", "Hobbit Atlas"), self.suggest("hob"))
+
+    def test_memory_budget_keeps_the_most_used_labels(self):
+        counts = {("author", "Popular Author"): 5, ("title", "Rare"): 1}
+        budget = sum(
+            PrefixIndex._entry_size(entry)
+            for entry in PrefixIndex._entries("author", "Popular Author")
+        )
+
+        index = PrefixIndex(counts, max_bytes=budget)
+
+        self.assertEqual(list(index.counts), [("author", "Popular Author")])
+        self.assertLessEqual(index.size, budget)
+
+
+class CatalogImportExportTest(BaseBookAPITest):
+    def setUp(self):
+        super().setUp()
+        admin = get_user_model().objects.create_user(
+            email="admin@test.com", password="testpass", is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        self.export_url = reverse("books:book-export")
+        self.import_url = reverse("books:book-import-catalog")
+
+    def test_export_streams_csv(self):
+        response = self.client.get(self.export_url)
+
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines,
+            [
+                "id,title,author,cover,inventory,daily_fee",
+                f"{self.book_1.id},Book Test,Author Test,HARD,3,5.00",
+            ],
+        )
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get(self.export_url, {"file_format": "ndjson"})
+
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(rows[0]["title"], "Book Test")
+        self.assertEqual(rows[0]["daily_fee"], "5.00")
+
+    def test_import_upserts_rows_and_reports_errors(self):
+        upload = SimpleUploadedFile(
+            "books.csv",
+            (
+                "id,title,author,cover,inventory,daily_fee\n"
+                f"{self.book_1.id},Updated Book,Author Test,HARD,9,5\n"
+                ",Imported Book,New Author,SOFT,2,1.50\n"
+                ",Broken Book,New Author,PAPER,2,1.50\n"
+            ).encode(),
+        )
+
+        response = self.client.post(
+            self.import_url, {"file": upload}, format="multipart"
+        )
+
+        self.assertEqual(response.data["imported"], 2)
+        self.assertEqual(response.data["errors"][0]["line"], 4)
+        self.book_1.refresh_from_db()
+        self.assertEqual(
+            (self.book_1.title, self.book_1.inventory), ("Updated Book", 9)
+        )
+        self.assertTrue(Book.objects.filter(title="Imported Book").exists())
+
+    def test_import_is_for_admins_only(self):
+        self.client.force_authenticate(user=None)
+
+        response = self.client.post(self.import_url, {}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_commands_round_trip_ndjson(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "books.ndjson")
+            call_command("export_books", path, stderr=StringIO())
+            Book.objects.all().delete()
+
+            call_command("import_books", path, stdout=StringIO())
+
+        self.assertEqual(
+            list(Book.objects.values_list("id", "title")),
+            [(self.book_1.id, "Book Test")],
+        )
+
+
+class FastRenderingTest(BaseBookAPITest):
+    def test_orjson_renderer_matches_json_renderer(self):
+        data = {
+            "daily_fee": Decimal("5.50"),
+            "borrow_date": date(2024, 5, 1),
+            "created_at": datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc),
+            "id": uuid.UUID(int=1),
+            "title": "Кобзар\u2028",
+            1: [None, True, 1.5],
+        }
+
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_orjson_parser_rejects_invalid_json(self):
+        parser = ORJSONParser()
+
+        self.assertEqual(
+            parser.parse(BytesIO(b'{"title": "Book"}')), {"title": "Book"}
+        )
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b"{"))
+
+    def test_books_are_rendered_and_parsed_with_orjson(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                email="admin@example.com", password="password123"
+            )
+        )
+
+        with mock.patch(
+            "library_manage.renderers.orjson.dumps", wraps=orjson.dumps
+        ) as dumps, mock.patch(
+            "library_manage.renderers.orjson.loads", wraps=orjson.loads
+        ) as loads:
+            response = self.client.post(
+                self.book_list_url, self.new_book_data, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["daily_fee"], "10.00")
+        dumps.assert_called_once()
+        loads.assert_called_once()
+
+    def test_books_list_as_msgpack(self):
+        response = self.client.get(
+            self.book_list_url, HTTP_ACCEPT="application/msgpack"
+        )
+
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            self.client.get(self.book_list_url).json(),
+        )
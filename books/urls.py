@@ -1,11 +1,41 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework import routers
 
-from books.views import BookViewSet
+from books.views import AsyncBookDetailView, AsyncBookListView, BookViewSet
+from library_manage.async_views import route_reads
 
 router = routers.DefaultRouter()
 router.register("", BookViewSet)
 
 urlpatterns = [path("", include(router.urls))]
 
+if settings.ASYNC_READ_VIEWS:
+    # Ahead of the router, whose views keep serving the writes.
+    urlpatterns[:0] = [
+        path(
+            "",
+            route_reads(
+                AsyncBookListView.as_view(),
+                BookViewSet.as_view({"get": "list", "post": "create"}),
+            ),
+            name="book-list",
+        ),
+        path(
+            "<int:pk>/",
+            route_reads(
+                AsyncBookDetailView.as_view(),
+                BookViewSet.as_view(
+                    {
+                        "get": "retrieve",
+                        "put": "update",
+                        "patch": "partial_update",
+                        "delete": "destroy",
+                    }
+                ),
+            ),
+            name="book-detail",
+        ),
+    ]
+
 app_name = "books"
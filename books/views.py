@@ -1,15 +1,193 @@
-from rest_framework import viewsets
+from asgiref.sync import sync_to_async
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAdminUser, AllowAny
+from rest_framework.response import Response
 
+from books.autocomplete import get_autocomplete_index
+from books.cache import CatalogCacheMixin, get_cache_stats
+from books.catalog import (
+    CATALOG_FIELDS,
+    export_catalog_rows,
+    import_catalog,
+)
 from books.models import Book
+from books.pagination import BookPagination
+from books.search import search_books
 from books.serializers import BookSerializer
+from library_manage.async_views import (
+    AsyncGenericAPIView,
+    AsyncListMixin,
+    AsyncRetrieveMixin,
+)
+from library_manage.db_routers import ReplicaReadMixin
+from library_manage.streaming import (
+    FORMATS,
+    export_response,
+    get_file_format,
+    iter_records,
+)
 
+AUTOCOMPLETE_MAX_LIMIT = 20
 
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
+
+def get_search_query(request):
+    return request.query_params.get("search", "").strip()
+
+
+class BookViewSet(
+    ReplicaReadMixin, CatalogCacheMixin, viewsets.ModelViewSet
+):
+    queryset = Book.objects.select_related("stats")
     serializer_class = BookSerializer
+    pagination_class = BookPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        search = get_search_query(self.request)
+        if self.action == "list" and search:
+            queryset = search_books(queryset, search)
+        return queryset
 
     def get_permissions(self):
-        if self.action == "list":
+        if self.action in ("list", "autocomplete"):
             return (AllowAny(),)
         return (IsAdminUser(),)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="search",
+                type=OpenApiTypes.STR,
+                description="Ranked search over title and author, the "
+                "last word matches as a prefix (ex. ?search=tolkien hob)",
+            ),
+        ],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                type=OpenApiTypes.STR,
+                description="Typed prefix of a title or author (ex. ?q=hob)",
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=OpenApiTypes.INT,
+                description=f"Number of suggestions, at most "
+                f"{AUTOCOMPLETE_MAX_LIMIT}",
+            ),
+        ],
+    )
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """Title and author suggestions served from memory."""
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            limit = 10
+        limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+        prefix = request.query_params.get("q", "")
+        return Response(
+            {"results": get_autocomplete_index().suggest(prefix, limit)}
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                type=OpenApiTypes.STR,
+                enum=FORMATS,
+                description="Export format, csv by default",
+            ),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+    )
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        file_format = get_file_format(request.query_params.get("file_format"))
+        if file_format is None:
+            return Response(
+                {"file_format": f"Must be one of {', '.join(FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return export_response(
+            file_format, "books", CATALOG_FIELDS, export_catalog_rows()
+        )
+
+    @extend_schema(
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                    "file_format": {"type": "string", "enum": FORMATS},
+                },
+            }
+        },
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        parser_classes=(MultiPartParser,),
+    )
+    def import_catalog(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": "A CSV or NDJSON file is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        file_format = get_file_format(
+            request.data.get("file_format"), upload.name
+        )
+        if file_format is None:
+            return Response(
+                {"file_format": f"Must be one of {', '.join(FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        imported, errors = import_catalog(iter_records(upload, file_format))
+        return Response({"imported": imported, "errors": errors})
+
+    @action(detail=False, methods=["get"], url_path="cache-stats")
+    def cache_stats(self, request):
+        return Response(get_cache_stats())
+
+
+class AsyncBookListView(
+    CatalogCacheMixin, AsyncListMixin, AsyncGenericAPIView
+):
+    """Async GET of the book list, same responses as ``BookViewSet``."""
+
+    queryset = Book.objects.select_related("stats")
+    serializer_class = BookSerializer
+    pagination_class = BookPagination
+    permission_classes = (AllowAny,)
+    replica_reads = True
+    action = "list"
+
+    async def aget_list_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        search = get_search_query(self.request)
+        if search:
+            # The in-memory index may need to be (re)built from the DB.
+            queryset = await sync_to_async(search_books)(queryset, search)
+        return queryset
+
+
+class AsyncBookDetailView(
+    CatalogCacheMixin, AsyncRetrieveMixin, AsyncGenericAPIView
+):
+    queryset = Book.objects.select_related("stats")
+    serializer_class = BookSerializer
+    permission_classes = (IsAdminUser,)
+    replica_reads = True
+    action = "retrieve"
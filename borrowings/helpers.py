@@ -1,20 +1,27 @@
-import os
-import requests
-from dotenv import load_dotenv
+from borrowings.notifier import get_notifier
 
-load_dotenv()
-
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-TELEGRAM_API_URL = (
-    f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-)
+TELEGRAM_MESSAGE_LIMIT = 4096
 
 
 def send_telegram_message(text):
-    data = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": text,
-    }
-    response = requests.post(TELEGRAM_API_URL, data=data)
-    return response.json()
+    return get_notifier().send(text)
+
+
+def pack_messages(entries, header="", limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Group text entries into as few messages as possible, each at most
+    ``limit`` characters long. Entries that do not fit into a single
+    message on their own are truncated.
+    """
+    separator = "\n\n"
+    digest = header
+    for entry in entries:
+        entry = entry[: limit - len(header) - len(separator)]
+        candidate = f"{digest}{separator}{entry}" if digest else entry
+        if len(candidate) <= limit:
+            digest = candidate
+            continue
+        yield digest
+        digest = f"{header}{separator}{entry}" if header else entry
+    if digest and digest != header:
+        yield digest
@@ -0,0 +1,122 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from books.models import Book
+from books.pagination import BookPagination
+from borrowings.models import Borrowing, Notification
+from borrowings.pagination import BorrowingPagination
+from borrowings.tasks import get_overdue_borrowings
+from payments.models import Payment
+from payments.pagination import PaymentPagination
+
+FULL_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (\w+)$", re.MULTILINE),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plan of the main query behind each hot endpoint "
+        "and task, flagging full table scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail-on-seq-scan",
+            action="store_true",
+            help="Exit with an error if any plan scans a whole table.",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run EXPLAIN ANALYZE (PostgreSQL only).",
+        )
+
+    def get_queries(self):
+        """
+        Each list query is shaped like a page behind a cursor, which is
+        what the keyset paginators run for every page but the first.
+        """
+        now = timezone.now()
+        reader_id = 0
+        after_id = Q(id__gt=0)
+        after_borrowing = Q(borrow_date__gt=now.date()) | Q(
+            borrow_date=now.date(), id__gt=0
+        )
+        borrowing_order = BorrowingPagination.ordering
+        borrowings_page = BorrowingPagination.page_size + 1
+
+        return {
+            "books: list page": Book.objects.filter(after_id).order_by(
+                *BookPagination.ordering
+            )[: BookPagination.page_size + 1],
+            "borrowings: list page (staff)": (
+                Borrowing.objects.filter(after_borrowing)
+                .order_by(*borrowing_order)[:borrowings_page]
+            ),
+            "borrowings: list page (staff, is_active)": (
+                Borrowing.objects.filter(
+                    after_borrowing, actual_return_date__isnull=True
+                ).order_by(*borrowing_order)[:borrowings_page]
+            ),
+            "borrowings: list page (reader, is_active)": (
+                Borrowing.objects.filter(
+                    after_borrowing,
+                    user_id=reader_id,
+                    actual_return_date__isnull=True,
+                ).order_by(*borrowing_order)[:borrowings_page]
+            ),
+            "borrowings: overdue check": get_overdue_borrowings(now.date()),
+            "payments: list page (reader)": (
+                Payment.objects.filter(after_id, borrowing__user_id=reader_id)
+                .order_by(*PaymentPagination.ordering)[
+                    : PaymentPagination.page_size + 1
+                ]
+            ),
+            "payments: stripe session lookup": Payment.objects.filter(
+                session_id="cs_explain"
+            ),
+            "notifications: outbox drain": Notification.objects.filter(
+                sent_at__isnull=True,
+                next_attempt_at__lte=now,
+                attempts__lt=settings.NOTIFICATION_MAX_ATTEMPTS,
+            ).order_by("next_attempt_at", "id")[
+                : settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+            ],
+        }
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options["analyze"]:
+            if connection.vendor != "postgresql":
+                raise CommandError("--analyze needs PostgreSQL.")
+            explain_options["analyze"] = True
+
+        full_scan_pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        full_scans = []
+
+        for label, queryset in self.get_queries().items():
+            plan = queryset.explain(**explain_options)
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(plan)
+            self.stdout.write("")
+
+            if full_scan_pattern:
+                tables = sorted(set(full_scan_pattern.findall(plan)))
+                if tables:
+                    full_scans.append(f"{label} ({', '.join(tables)})")
+
+        if not full_scans:
+            self.stdout.write(self.style.SUCCESS("No full table scans."))
+            return
+
+        message = "Full table scans in: " + "; ".join(full_scans)
+        if options["fail_on_seq_scan"]:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(message))
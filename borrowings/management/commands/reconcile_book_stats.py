@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from borrowings.stats import reconcile_book_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-book loan counters from borrowings with one "
+        "grouped query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = reconcile_book_stats(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled stats of {written} books")
+        )
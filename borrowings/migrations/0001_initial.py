@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('books', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['next_attempt_at'], name='notification_pending_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Borrowing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('borrow_date', models.DateField(auto_now_add=True)),
+                ('expected_return_date', models.DateField()),
+                ('actual_return_date', models.DateField(blank=True, null=True)),
+                ('checkout_status', models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='borrowings', to='books.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='borrowings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['borrow_date', 'id'], name='borrowing_page_idx'), models.Index(fields=['actual_return_date', 'expected_return_date'], name='borrowing_return_dates_idx'), models.Index(fields=['user', 'actual_return_date'], name='borrowing_user_active_idx'), models.Index(fields=['updated_at'], name='borrowing_updated_idx'), models.Index(condition=models.Q(('actual_return_date__isnull', True)), fields=['expected_return_date'], name='borrowing_open_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='borrowing',
+            constraint=models.CheckConstraint(check=models.Q(('expected_return_date__gte', models.F('borrow_date')), ('actual_return_date__gte', models.F('borrow_date'))), name='return_date_gte_borrow_date'),
+        ),
+    ]
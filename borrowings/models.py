@@ -1,12 +1,20 @@
+from collections import Counter
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q, F
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 from books.models import Book
 
 
 class Borrowing(models.Model):
+    class CheckoutStatusChoices(models.TextChoices):
+        PENDING = "PENDING"
+        READY = "READY"
+        FAILED = "FAILED"
+
     borrow_date = models.DateField(auto_now_add=True)
     expected_return_date = models.DateField()
     actual_return_date = models.DateField(null=True, blank=True)
@@ -18,6 +26,14 @@ class Borrowing(models.Model):
         on_delete=models.CASCADE,
         related_name="borrowings",
     )
+    checkout_status = models.CharField(
+        max_length=10,
+        choices=CheckoutStatusChoices.choices,
+        default=CheckoutStatusChoices.PENDING,
+    )
+    # Touched by every write, including the payments of the borrowing;
+    # list and detail ETags are derived from it.
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
@@ -29,6 +45,30 @@ class Borrowing(models.Model):
                 name="return_date_gte_borrow_date",
             )
         ]
+        indexes = [
+            # Keyset pagination of the borrowing list.
+            models.Index(
+                fields=["borrow_date", "id"], name="borrowing_page_idx"
+            ),
+            # is_active filter on the list and the overdue check.
+            models.Index(
+                fields=["actual_return_date", "expected_return_date"],
+                name="borrowing_return_dates_idx",
+            ),
+            # A reader's own borrowings, optionally only the active ones.
+            models.Index(
+                fields=["user", "actual_return_date"],
+                name="borrowing_user_active_idx",
+            ),
+            # Rows changed since the last reporting refresh.
+            models.Index(fields=["updated_at"], name="borrowing_updated_idx"),
+            # Open borrowings by due date; stays small as books come back.
+            models.Index(
+                fields=["expected_return_date"],
+                condition=Q(actual_return_date__isnull=True),
+                name="borrowing_open_due_idx",
+            ),
+        ]
 
     @staticmethod
     def validate_inventory(book: Book, error_to_raise):
@@ -38,6 +78,45 @@ class Borrowing(models.Model):
                 f"are currently unavailable"
             )
 
+    @staticmethod
+    def cancel_checkouts(borrowings):
+        """
+        Compensate borrowings whose payment session could not be created:
+        mark them failed and put the reserved copies back on the shelf.
+        Returns the ids that were still pending.
+        """
+        with transaction.atomic():
+            pending = Borrowing.objects.select_for_update().filter(
+                pk__in=[borrowing.pk for borrowing in borrowings],
+                checkout_status=Borrowing.CheckoutStatusChoices.PENDING,
+            )
+            cancelled = list(pending)
+            if cancelled:
+                Borrowing.objects.filter(
+                    pk__in=[borrowing.pk for borrowing in cancelled]
+                ).update(
+                    checkout_status=Borrowing.CheckoutStatusChoices.FAILED,
+                    updated_at=timezone.now(),
+                )
+                Book.release_copies(
+                    Counter(borrowing.book_id for borrowing in cancelled)
+                )
+                # Imported here, borrowings.stats depends on this module.
+                from borrowings.stats import record_loans_closed
+
+                record_loans_closed(cancelled, cancelled=True)
+        return [borrowing.pk for borrowing in cancelled]
+
+    @staticmethod
+    def cancel_checkout(borrowing):
+        return bool(Borrowing.cancel_checkouts([borrowing]))
+
+    @staticmethod
+    def touch(borrowing_id):
+        Borrowing.objects.filter(pk=borrowing_id).update(
+            updated_at=timezone.now()
+        )
+
     def clean(self):
         Borrowing.validate_inventory(self.book, ValidationError)
         if (
@@ -50,3 +129,24 @@ class Borrowing(models.Model):
 
     def __str__(self):
         return f"{self.book.title}, {self.expected_return_date}"
+
+
+class Notification(models.Model):
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=Q(sent_at__isnull=True),
+                name="notification_pending_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"Notification #{self.id}, sent: {self.sent_at}"
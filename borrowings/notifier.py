@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+
+class TelegramError(Exception):
+    pass
+
+
+class TelegramRateLimited(TelegramError):
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limited by Telegram for {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RequestsTransport:
+    """Keep-alive HTTPS transport backed by a pooled ``requests.Session``."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=settings.TELEGRAM_POOL_SIZE
+        )
+        self.session.mount("https://", adapter)
+        self.timeout = (
+            settings.TELEGRAM_CONNECT_TIMEOUT,
+            settings.TELEGRAM_READ_TIMEOUT,
+        )
+
+    def post(self, url, data):
+        try:
+            response = self.session.post(url, data=data, timeout=self.timeout)
+            return response.json()
+        except (requests.RequestException, ValueError) as error:
+            raise TelegramError(str(error)) from error
+
+
+class FakeTransport:
+    """
+    In-process transport for tests and local runs. Records every payload
+    in ``sent`` and answers with queued ``responses`` or a plain success.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.responses = deque()
+
+    def post(self, url, data):
+        self.sent.append(data)
+        if self.responses:
+            return self.responses.popleft()
+        return {"ok": True, "result": {"message_id": len(self.sent)}}
+
+
+class TelegramNotifier:
+    def __init__(self, transport, token, chat_id):
+        self.transport = transport
+        self.chat_id = chat_id
+        self.api_url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self._lock = threading.Lock()
+        self._next_send_at = 0.0
+
+    def _wait_for_slot(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_send_at - now
+            if wait > settings.TELEGRAM_MAX_RETRY_WAIT:
+                raise TelegramRateLimited(wait)
+            self._next_send_at = (
+                max(now, self._next_send_at)
+                + settings.TELEGRAM_MIN_SEND_INTERVAL
+            )
+        if wait > 0:
+            time.sleep(wait)
+
+    def _back_off(self, retry_after):
+        with self._lock:
+            self._next_send_at = max(
+                self._next_send_at, time.monotonic() + retry_after
+            )
+
+    def send(self, text):
+        data = {
+            "chat_id": self.chat_id,
+            "text": text,
+        }
+        for _ in range(2):
+            self._wait_for_slot()
+            result = self.transport.post(self.api_url, data)
+            if result.get("ok"):
+                return result
+
+            retry_after = result.get("parameters", {}).get("retry_after")
+            if retry_after is None:
+                raise TelegramError(
+                    result.get("description", "Telegram rejected the message")
+                )
+            self._back_off(retry_after)
+
+        raise TelegramRateLimited(retry_after)
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            transport = import_string(settings.TELEGRAM_TRANSPORT)()
+            _notifier = TelegramNotifier(
+                transport,
+                settings.TELEGRAM_BOT_TOKEN,
+                settings.TELEGRAM_CHAT_ID,
+            )
+        return _notifier
+
+
+def reset_notifier():
+    global _notifier
+    with _notifier_lock:
+        _notifier = None
+
+
+@receiver(setting_changed)
+def reset_notifier_on_setting_change(*, setting, **kwargs):
+    if setting.startswith("TELEGRAM_"):
+        reset_notifier()
@@ -0,0 +1,18 @@
+from django.db import transaction
+
+from borrowings.models import Notification
+from borrowings.tasks import drain_notification_outbox
+
+
+def enqueue_notification(text):
+    """
+    Store a Telegram notification in the outbox.
+
+    The row is written in the caller's transaction, so it is only
+    delivered if that transaction commits. A drain is kicked off right
+    after commit; the periodic drain picks the row up if the broker is
+    unavailable at that moment.
+    """
+    notification = Notification.objects.create(text=text)
+    transaction.on_commit(drain_notification_outbox.delay, robust=True)
+    return notification
@@ -0,0 +1,7 @@
+from library_manage.pagination import KeysetPagination
+
+
+class BorrowingPagination(KeysetPagination):
+    ordering = ("borrow_date", "id")
+    page_size = 20
+    max_page_size = 100
@@ -1,13 +1,19 @@
+from collections import Counter
 from datetime import datetime
 
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from books.models import Book
 from books.serializers import BookSerializer
 from borrowings.models import Borrowing
-from payments.helpers import create_stripe_session
-from payments.models import Payment
+from borrowings.stats import record_loans_closed, record_loans_opened
+from borrowings.tasks import create_borrowing_checkout, create_bulk_checkout
+from library_manage.streaming import ExportFilterSerializer
+from payments.fines import sync_fines
 from payments.serializers import PaymentSerializer
 from users.serializers import UserSerializer
 
@@ -24,8 +30,10 @@ class BorrowingSerializer(serializers.ModelSerializer):
             "actual_return_date",
             "book",
             "user",
+            "checkout_status",
             "payments",
         )
+        read_only_fields = ("checkout_status",)
 
 
 class BorrowingListSerializer(BorrowingSerializer):
@@ -49,7 +57,9 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
             "expected_return_date",
             "book",
             "user",
+            "checkout_status",
         )
+        read_only_fields = ("checkout_status",)
 
     def validate(self, attrs):
         data = super(BorrowingCreateSerializer, self).validate(attrs=attrs)
@@ -57,24 +67,22 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        request = self.context.get("request")
         with transaction.atomic():
             book = validated_data["book"]
-            if book.inventory > 0:
-                book.inventory -= 1
-                book.save()
-            else:
+            if not Book.reserve_copy(book.id):
                 raise serializers.ValidationError(
                     "Inventory for the book is empty."
                 )
 
             borrowing = Borrowing.objects.create(**validated_data)
+            record_loans_opened([borrowing])
 
-            try:
-                create_stripe_session(request, borrowing)
-            except Exception as e:
-                borrowing.delete()
-                raise serializers.ValidationError(str(e))
+            # The Stripe session is created by a worker once the
+            # reservation is committed; the client polls checkout_status.
+            transaction.on_commit(
+                lambda: create_borrowing_checkout.delay(borrowing.id),
+                robust=True,
+            )
 
             return borrowing
 
@@ -92,28 +100,178 @@ class BorrowingReturnSerializer(serializers.ModelSerializer):
                 "This borrowing has already been returned."
             )
 
+        if (
+            self.instance.checkout_status
+            == Borrowing.CheckoutStatusChoices.FAILED
+        ):
+            raise serializers.ValidationError(
+                "This borrowing was cancelled because its payment failed."
+            )
+
         return data
 
     def update(self, instance, validated_data):
         with transaction.atomic():
-            instance.actual_return_date = datetime.now().date()
-            instance.save()
+            return_date = datetime.now().date()
+            returned = Borrowing.objects.filter(
+                pk=instance.pk, actual_return_date__isnull=True
+            ).update(
+                actual_return_date=return_date, updated_at=timezone.now()
+            )
+            if not returned:
+                raise serializers.ValidationError(
+                    "This borrowing has already been returned."
+                )
+            instance.actual_return_date = return_date
 
-            book = instance.book
-            book.inventory += 1
-            book.save()
+            Book.release_copy(instance.book_id)
+            record_loans_closed([instance])
 
             if instance.actual_return_date > instance.expected_return_date:
-                self.create_fine_payment(instance)
+                sync_fines(
+                    [
+                        (
+                            instance.id,
+                            instance.expected_return_date,
+                            instance.book.daily_fee,
+                        )
+                    ],
+                    return_date,
+                )
 
             return instance
 
-    def create_fine_payment(self, borrowing):
-        fine_amount = Payment.calculate_fine(borrowing)
-        if fine_amount > 0:
-            Payment.objects.create(
-                status=Payment.StatusChoices.PENDING,
-                type=Payment.TypeChoices.FINE,
-                borrowing=borrowing,
-                money_to_pay=fine_amount,
+
+class BorrowingBulkItemSerializer(serializers.Serializer):
+    book = serializers.IntegerField(min_value=1)
+    expected_return_date = serializers.DateField()
+
+    def validate_expected_return_date(self, value):
+        if value < datetime.now().date():
+            raise serializers.ValidationError(
+                "Expected return date cannot be in the past."
             )
+        return value
+
+
+class BorrowingBulkCreateSerializer(serializers.Serializer):
+    items = BorrowingBulkItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.BORROWING_BULK_MAX_ITEMS,
+    )
+
+    def validate(self, attrs):
+        counts = Counter(item["book"] for item in attrs["items"])
+        books = Book.objects.in_bulk(counts)
+
+        errors = []
+        for book_id, count in counts.items():
+            book = books.get(book_id)
+            if book is None:
+                errors.append(f"Book {book_id} does not exist.")
+            elif book.inventory < count:
+                errors.append(
+                    f"Only {book.inventory} copies of {book.title} "
+                    f"are available, {count} requested."
+                )
+        if errors:
+            raise serializers.ValidationError({"items": errors})
+        attrs["books"] = books
+        return attrs
+
+    def create(self, validated_data):
+        items = validated_data["items"]
+        user = validated_data["user"]
+        with transaction.atomic():
+            counts = Counter(item["book"] for item in items)
+            if not Book.reserve_copies(counts):
+                raise serializers.ValidationError(
+                    "Inventory changed while the borrowings were created."
+                )
+
+            borrowings = Borrowing.objects.bulk_create(
+                Borrowing(
+                    book_id=item["book"],
+                    user=user,
+                    expected_return_date=item["expected_return_date"],
+                )
+                for item in items
+            )
+            record_loans_opened(borrowings)
+
+            borrowing_ids = [borrowing.id for borrowing in borrowings]
+            transaction.on_commit(
+                lambda: create_bulk_checkout.delay(borrowing_ids),
+                robust=True,
+            )
+
+            return borrowings
+
+
+class BorrowingBulkReturnSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BORROWING_BULK_MAX_ITEMS,
+    )
+
+    def create(self, validated_data):
+        ids = set(validated_data["ids"])
+        with transaction.atomic():
+            borrowings = list(
+                Borrowing.objects.select_for_update()
+                .select_related("book")
+                .filter(pk__in=ids, actual_return_date__isnull=True)
+                .exclude(
+                    checkout_status=Borrowing.CheckoutStatusChoices.FAILED
+                )
+            )
+            not_returnable = ids - {borrowing.id for borrowing in borrowings}
+            if not_returnable:
+                raise serializers.ValidationError(
+                    {
+                        "ids": [
+                            f"Borrowing {pk} does not exist, was already "
+                            f"returned or was cancelled."
+                            for pk in sorted(not_returnable)
+                        ]
+                    }
+                )
+
+            return_date = datetime.now().date()
+            Borrowing.objects.filter(pk__in=ids).update(
+                actual_return_date=return_date, updated_at=timezone.now()
+            )
+            Book.release_copies(
+                Counter(borrowing.book_id for borrowing in borrowings)
+            )
+            record_loans_closed(borrowings)
+
+            for borrowing in borrowings:
+                borrowing.actual_return_date = return_date
+            # Overdue loans may already carry a fine from the nightly run.
+            fines = sync_fines(
+                [
+                    (
+                        borrowing.id,
+                        borrowing.expected_return_date,
+                        borrowing.book.daily_fee,
+                    )
+                    for borrowing in borrowings
+                    if borrowing.expected_return_date < return_date
+                ],
+                return_date,
+            )
+
+            return borrowings, fines
+
+
+class BorrowingExportFilterSerializer(ExportFilterSerializer):
+    """Date range on borrow_date."""
+
+    is_active = serializers.BooleanField(required=False, allow_null=True)
+    checkout_status = serializers.ChoiceField(
+        choices=Borrowing.CheckoutStatusChoices.choices, required=False
+    )
+    user_id = serializers.IntegerField(required=False)
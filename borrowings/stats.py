@@ -0,0 +1,167 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from books.cache import invalidate_catalog
+from books.models import BookStats
+from borrowings.models import Borrowing
+from library_manage.streaming import chunked
+
+COUNTERS = ("active_loans", "overdue_loans", "total_loans")
+OPEN_LOAN = Q(actual_return_date__isnull=True) & ~Q(
+    checkout_status=Borrowing.CheckoutStatusChoices.FAILED
+)
+
+
+def _counter_delta(deltas, index):
+    return Case(
+        *(
+            When(book_id=book_id, then=Value(delta[index]))
+            for book_id, delta in deltas.items()
+            if delta[index]
+        ),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _next_due_date():
+    return Subquery(
+        Borrowing.objects.filter(OPEN_LOAN, book_id=OuterRef("book_id"))
+        .order_by("expected_return_date")
+        .values("expected_return_date")[:1]
+    )
+
+
+def apply_deltas(deltas):
+    """
+    Add ``(active, overdue, total)`` deltas per book id to the counters
+    and recompute the next due date, with one UPDATE ... CASE.
+    Must run after the borrowings themselves were written.
+    """
+    if not deltas:
+        return
+    BookStats.objects.bulk_create(
+        [BookStats(book_id=book_id) for book_id in deltas],
+        ignore_conflicts=True,
+    )
+    BookStats.objects.filter(book_id__in=deltas).update(
+        **{
+            counter: F(counter) + _counter_delta(deltas, index)
+            for index, counter in enumerate(COUNTERS)
+        },
+        next_due_date=_next_due_date(),
+        updated_at=timezone.now(),
+    )
+
+
+def record_loans_opened(borrowings):
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for borrowing in borrowings:
+        deltas[borrowing.book_id][0] += 1
+        deltas[borrowing.book_id][2] += 1
+    apply_deltas(deltas)
+
+
+def record_loans_closed(borrowings, cancelled=False):
+    """Count returned loans, or cancelled ones that never counted."""
+    today = timezone.localdate()
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for borrowing in borrowings:
+        deltas[borrowing.book_id][0] -= 1
+        if borrowing.expected_return_date < today:
+            deltas[borrowing.book_id][1] -= 1
+        if cancelled:
+            deltas[borrowing.book_id][2] -= 1
+    apply_deltas(deltas)
+
+
+def get_loan_aggregates():
+    today = timezone.localdate()
+    return (
+        Borrowing.objects.exclude(
+            checkout_status=Borrowing.CheckoutStatusChoices.FAILED
+        )
+        .values("book_id")
+        .annotate(
+            total_loans=Count("id"),
+            active_loans=Count("id", filter=OPEN_LOAN),
+            overdue_loans=Count(
+                "id", filter=OPEN_LOAN & Q(expected_return_date__lt=today)
+            ),
+            next_due_date=Min("expected_return_date", filter=OPEN_LOAN),
+        )
+        .order_by()
+    )
+
+
+def reconcile_book_stats(batch_size=1000):
+    """Rebuild every counter from one grouped query over borrowings."""
+    written = 0
+    with transaction.atomic():
+        reset = BookStats.objects.update(
+            active_loans=0,
+            overdue_loans=0,
+            total_loans=0,
+            next_due_date=None,
+            updated_at=timezone.now(),
+        )
+        for chunk in chunked(
+            get_loan_aggregates().iterator(chunk_size=batch_size), batch_size
+        ):
+            BookStats.objects.bulk_create(
+                [BookStats(**row) for row in chunk],
+                update_conflicts=True,
+                unique_fields=("book",),
+                update_fields=(*COUNTERS, "next_due_date", "updated_at"),
+            )
+            written += len(chunk)
+        if reset or written:
+            invalidate_catalog()
+    return written
+
+
+def refresh_overdue_counts():
+    """
+    Loans turn overdue with the calendar rather than with a request, so
+    the overdue counters are recounted daily from open loans only.
+    """
+    today = timezone.localdate()
+    overdue = (
+        Borrowing.objects.filter(OPEN_LOAN, expected_return_date__lt=today)
+        .values("book_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    with transaction.atomic():
+        changed = BookStats.objects.filter(overdue_loans__gt=0).update(
+            overdue_loans=0, updated_at=timezone.now()
+        )
+        for chunk in chunked(overdue.iterator(), 1000):
+            changed += BookStats.objects.filter(
+                book_id__in=[row["book_id"] for row in chunk]
+            ).update(
+                overdue_loans=Case(
+                    *(
+                        When(book_id=row["book_id"], then=Value(row["count"]))
+                        for row in chunk
+                    ),
+                    output_field=IntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+        if changed:
+            invalidate_catalog()
@@ -1,32 +1,261 @@
 from datetime import timedelta
 
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
-from borrowings.helpers import send_telegram_message
-from borrowings.models import Borrowing
+from borrowings.helpers import pack_messages, send_telegram_message
+from borrowings.models import Borrowing, Notification
+from borrowings.notifier import TelegramError, TelegramRateLimited
+from borrowings.stats import refresh_overdue_counts
+from payments.gateway import (
+    CircuitOpen,
+    PaymentGatewayError,
+    PaymentGatewayUnavailable,
+)
+from payments.helpers import create_stripe_session
+from payments.models import Payment
+
+
+def format_overdue_borrowing(row):
+    book_title, first_name, last_name, email, return_date = row
+    return (
+        f"User: {first_name} {last_name}\nBook: {book_title}\n"
+        f"Email user: {email}\n"
+        f"Return date: {return_date}"
+    )
+
+
+@shared_task(bind=True, max_retries=5)
+def send_telegram_digest(self, text):
+    try:
+        send_telegram_message(text)
+    except TelegramRateLimited as error:
+        raise self.retry(exc=error, countdown=error.retry_after)
+    except TelegramError as error:
+        raise self.retry(exc=error, countdown=30 * 2**self.request.retries)
+
+
+def get_overdue_borrowings(due_date):
+    return (
+        Borrowing.objects.filter(
+            expected_return_date__lte=due_date,
+            actual_return_date__isnull=True,
+        )
+        .exclude(checkout_status=Borrowing.CheckoutStatusChoices.FAILED)
+        .order_by("expected_return_date", "id")
+    )
 
 
 @shared_task
 def check_overdue_borrowings():
     today = timezone.now().date()
     tomorrow = today + timedelta(days=1)
-    overdue_borrowings = Borrowing.objects.filter(
-        expected_return_date__lte=tomorrow, actual_return_date__isnull=True
+    overdue_rows = (
+        get_overdue_borrowings(tomorrow)
+        .values_list(
+            "book__title",
+            "user__first_name",
+            "user__last_name",
+            "user__email",
+            "expected_return_date",
+        )
+        .iterator(chunk_size=settings.OVERDUE_BORROWINGS_CHUNK_SIZE)
+    )
+
+    digests_sent = 0
+    for digest in pack_messages(
+        (format_overdue_borrowing(row) for row in overdue_rows),
+        header="Overdue borrowings:",
+    ):
+        send_telegram_digest.delay(digest)
+        digests_sent += 1
+
+    if not digests_sent:
+        send_telegram_digest.delay("No borrowings overdue today!")
+
+    return digests_sent
+
+
+@shared_task
+def refresh_book_overdue_counts():
+    refresh_overdue_counts()
+
+
+def get_retry_delay(attempts, error):
+    delay = settings.NOTIFICATION_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    if isinstance(error, TelegramRateLimited):
+        delay = max(delay, error.retry_after)
+    return timedelta(seconds=delay)
+
+
+def deliver_notification(notification):
+    try:
+        send_telegram_message(notification.text)
+    except TelegramError as error:
+        return error
+    return None
+
+
+def claim_notifications(batch_size, now):
+    """
+    Lease a batch of due notifications in one short transaction by
+    pushing their next attempt past NOTIFICATION_LEASE_TIMEOUT, so other
+    workers skip them while they are being delivered. Messages left
+    unrecorded by a crashed worker come back once the lease runs out.
+    """
+    with transaction.atomic():
+        batch = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(
+                sent_at__isnull=True,
+                next_attempt_at__lte=now,
+                attempts__lt=settings.NOTIFICATION_MAX_ATTEMPTS,
+            )
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        Notification.objects.filter(
+            id__in=[notification.id for notification in batch]
+        ).update(
+            next_attempt_at=now
+            + timedelta(seconds=settings.NOTIFICATION_LEASE_TIMEOUT)
+        )
+    return batch
+
+
+@shared_task
+def drain_notification_outbox():
+    batch_size = settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+    batch = claim_notifications(batch_size, timezone.now())
+
+    # Delivered outside of any transaction, each result recorded right
+    # away so that a crash resends at most the message in flight.
+    sent = 0
+    for notification in batch:
+        error = deliver_notification(notification)
+        now = timezone.now()
+        if error is None:
+            Notification.objects.filter(id=notification.id).update(
+                sent_at=now
+            )
+            sent += 1
+            continue
+        attempts = notification.attempts + 1
+        Notification.objects.filter(id=notification.id).update(
+            attempts=attempts,
+            next_attempt_at=now + get_retry_delay(attempts, error),
+            last_error=str(error),
+        )
+
+    if len(batch) == batch_size:
+        drain_notification_outbox.delay()
+
+    return sent
+
+
+def create_checkout(task, borrowing_ids):
+    """
+    Create one Stripe session for the still pending borrowings and a
+    payment per borrowing pointing at it. An unavailable gateway is
+    retried with the task's policy; the borrowings are cancelled after
+    that, or at once when the gateway rejects the request.
+    """
+    borrowings = list(
+        Borrowing.objects.select_related("book")
+        .filter(
+            pk__in=borrowing_ids,
+            checkout_status=Borrowing.CheckoutStatusChoices.PENDING,
+        )
+        .order_by("id")
     )
+    if not borrowings:
+        return None
+
+    try:
+        session = create_stripe_session(*borrowings)
+    except PaymentGatewayError as error:
+        if (
+            isinstance(error, PaymentGatewayUnavailable)
+            and task.request.retries < task.max_retries
+        ):
+            countdown = 10 * 2**task.request.retries
+            if isinstance(error, CircuitOpen):
+                countdown = max(countdown, error.retry_after)
+            raise task.retry(exc=error, countdown=countdown)
+        Borrowing.cancel_checkouts(borrowings)
+        return None
 
-    if overdue_borrowings.exists():
-        for borrowing in overdue_borrowings:
-            book_title = borrowing.book.title
-            user = f"{borrowing.user.first_name} {borrowing.user.last_name}"
-            email = borrowing.user.email
-            return_date = borrowing.expected_return_date
-            message = (
-                f"Overdue borrowing:\n"
-                f"User: {user}\nBook: {book_title}\n"
-                f"Email user: {email}\n"
-                f"Return date: {return_date}"
+    with transaction.atomic():
+        ready = set(
+            Borrowing.objects.select_for_update()
+            .filter(
+                pk__in=[borrowing.pk for borrowing in borrowings],
+                checkout_status=Borrowing.CheckoutStatusChoices.PENDING,
             )
-            send_telegram_message(message)
-    else:
-        send_telegram_message("No borrowings overdue today!")
+            .values_list("pk", flat=True)
+        )
+        Borrowing.objects.filter(pk__in=ready).update(
+            checkout_status=Borrowing.CheckoutStatusChoices.READY,
+            updated_at=timezone.now(),
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                status=Payment.StatusChoices.PENDING,
+                type=Payment.TypeChoices.PAYMENT,
+                borrowing=borrowing,
+                session_id=session.id,
+                session_url=session.url,
+                money_to_pay=borrowing.book.daily_fee,
+            )
+            for borrowing in borrowings
+            if borrowing.pk in ready
+        )
+
+    return session.id
+
+
+@shared_task(bind=True, max_retries=3)
+def create_borrowing_checkout(self, borrowing_id):
+    return create_checkout(self, [borrowing_id])
+
+
+@shared_task(bind=True, max_retries=3)
+def create_bulk_checkout(self, borrowing_ids):
+    return create_checkout(self, borrowing_ids)
+
+
+@shared_task
+def recover_pending_checkouts():
+    """
+    Pick up borrowings left PENDING, e.g. because enqueueing their
+    checkout failed while the broker was down. Those pending for longer
+    than CHECKOUT_RETRY_AFTER minutes are enqueued again (the checkout
+    is idempotent); past CHECKOUT_EXPIRE_AFTER they are cancelled and
+    their copies released.
+    """
+    now = timezone.now()
+    pending = Borrowing.objects.filter(
+        checkout_status=Borrowing.CheckoutStatusChoices.PENDING
+    ).order_by("updated_at", "id")
+
+    expired = list(
+        pending.filter(
+            updated_at__lt=now
+            - timedelta(minutes=settings.CHECKOUT_EXPIRE_AFTER)
+        ).only("id", "book_id", "expected_return_date")[
+            : settings.CHECKOUT_RECOVERY_BATCH_SIZE
+        ]
+    )
+    cancelled = Borrowing.cancel_checkouts(expired) if expired else []
+
+    stale_ids = list(
+        pending.filter(
+            updated_at__lt=now
+            - timedelta(minutes=settings.CHECKOUT_RETRY_AFTER)
+        ).values_list("id", flat=True)[: settings.CHECKOUT_RECOVERY_BATCH_SIZE]
+    )
+    for borrowing_id in stale_ids:
+        create_borrowing_checkout.delay(borrowing_id)
+
+    return len(stale_ids), len(cancelled)
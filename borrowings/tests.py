@@ -1,18 +1,55 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    AsyncRequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.reverse import reverse
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, force_authenticate
 
-from books.models import Book
-from borrowings.models import Borrowing
+from books.cache import get_catalog_version
+from books.models import Book, BookStats
+from borrowings.helpers import pack_messages, send_telegram_message
+from borrowings.models import Borrowing, Notification
+from borrowings.notifier import (
+    TelegramRateLimited,
+    get_notifier,
+    reset_notifier,
+)
+from borrowings.outbox import enqueue_notification
 from borrowings.serializers import (
     BorrowingListSerializer,
     BorrowingRetrieveSerializer,
     BorrowingReturnSerializer,
 )
+from borrowings.views import (
+    AsyncBorrowingListView,
+    AsyncBorrowingRetrieveView,
+)
+from borrowings.tasks import (
+    check_overdue_borrowings,
+    create_borrowing_checkout,
+    create_bulk_checkout,
+    drain_notification_outbox,
+    recover_pending_checkouts,
+    refresh_book_overdue_counts,
+)
+from payments.gateway import PaymentGatewayError, PaymentGatewayUnavailable
+from payments.helpers import create_stripe_session
+from payments.models import Payment
 
 
 class BaseBorrowingAPITest(TestCase):
@@ -84,7 +121,7 @@ class AuthenticatedBorrowingAPITest(BaseBorrowingAPITest):
         borrowings = Borrowing.objects.all()
         serializer = BorrowingListSerializer(borrowings, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, response.data)
+        self.assertEqual(serializer.data, response.data["results"])
 
     def test_get_borrowing_detail(self):
         response = self.client.get(self.borrowing_detail_url)
@@ -97,6 +134,51 @@ class AuthenticatedBorrowingAPITest(BaseBorrowingAPITest):
         response = self.client.post(create_url, self.borrowing_data_2)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    @mock.patch("borrowings.serializers.create_borrowing_checkout.delay")
+    def test_create_borrowing_defers_checkout_session(self, delay):
+        create_url = reverse("borrowings:borrowing-create")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(create_url, self.borrowing_data_2)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data["checkout_status"],
+            Borrowing.CheckoutStatusChoices.PENDING,
+        )
+        delay.assert_called_once_with(response.data["id"])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 2)
+
+    def test_create_borrowing_replays_idempotency_key(self):
+        create_url = reverse("borrowings:borrowing-create")
+        cache.clear()
+        first = self.client.post(
+            create_url,
+            self.borrowing_data_2,
+            HTTP_IDEMPOTENCY_KEY="borrow-1",
+        )
+        replay = self.client.post(
+            create_url,
+            self.borrowing_data_2,
+            HTTP_IDEMPOTENCY_KEY="borrow-1",
+        )
+        reused = self.client.post(
+            create_url,
+            {**self.borrowing_data_2, "expected_return_date": "2999-01-01"},
+            HTTP_IDEMPOTENCY_KEY="borrow-1",
+        )
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(
+            reused.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Borrowing.objects.count(), 3)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 2)
+
     def test_borrowing_return(self):
         data = {"actual_return_date": datetime.now().date()}
         serializer = BorrowingReturnSerializer(
@@ -125,7 +207,77 @@ class IsAdminBorrowingApiTest(BaseBorrowingAPITest):
         response = self.client.get(self.borrowing_list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, response.data)
+        self.assertEqual(serializer.data, response.data["results"])
+
+    def test_borrowings_list_pages_over_borrow_date_and_id(self):
+        Borrowing.objects.create(**self.borrowing_data)
+        Borrowing.objects.filter(pk=self.borrowing_1.pk).update(
+            borrow_date=(datetime.now() - timedelta(days=3)).date()
+        )
+
+        first_page = self.client.get(
+            self.borrowing_list_url, {"page_size": 2}
+        )
+        second_page = self.client.get(first_page.data["next"])
+
+        ids = [
+            borrowing["id"]
+            for page in (first_page, second_page)
+            for borrowing in page.data["results"]
+        ]
+        expected_ids = list(
+            Borrowing.objects.order_by("borrow_date", "id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(ids, expected_ids)
+        self.assertEqual(ids[0], self.borrowing_1.id)
+        self.assertIsNone(second_page.data["next"])
+
+    def _count_list_queries(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def _add_borrowings_with_payments(self, count):
+        for _ in range(count):
+            borrowing = Borrowing.objects.create(**self.borrowing_data)
+            Payment.objects.create(
+                status=Payment.StatusChoices.PENDING,
+                type=Payment.TypeChoices.PAYMENT,
+                borrowing=borrowing,
+                money_to_pay=5,
+            )
+
+    def test_borrowing_list_query_count_does_not_grow_with_rows(self):
+        self._add_borrowings_with_payments(1)
+        queries_for_few = self._count_list_queries(self.borrowing_list_url)
+
+        self._add_borrowings_with_payments(10)
+        queries_for_many = self._count_list_queries(self.borrowing_list_url)
+
+        self.assertEqual(queries_for_few, queries_for_many)
+
+    def test_borrowing_detail_query_count_does_not_grow_with_payments(self):
+        Payment.objects.create(
+            status=Payment.StatusChoices.PENDING,
+            type=Payment.TypeChoices.PAYMENT,
+            borrowing=self.borrowing_1,
+            money_to_pay=5,
+        )
+        queries_for_few = self._count_list_queries(self.borrowing_detail_url)
+
+        for _ in range(5):
+            Payment.objects.create(
+                status=Payment.StatusChoices.PENDING,
+                type=Payment.TypeChoices.FINE,
+                borrowing=self.borrowing_1,
+                money_to_pay=1,
+            )
+        queries_for_many = self._count_list_queries(self.borrowing_detail_url)
+
+        self.assertEqual(queries_for_few, queries_for_many)
 
     def test_filter_borrowings_by_user_id(self):
         user_2 = get_user_model().objects.create_user(
@@ -146,9 +298,10 @@ class IsAdminBorrowingApiTest(BaseBorrowingAPITest):
         serializer = BorrowingListSerializer(expected_borrowings, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, response.data)
+        self.assertEqual(serializer.data, response.data["results"])
         self.assertNotIn(
-            BorrowingListSerializer(borrowing_3).data, response.data
+            BorrowingListSerializer(borrowing_3).data,
+            response.data["results"],
         )
 
     def test_filter_borrowings_by_is_active(self):
@@ -178,7 +331,779 @@ class IsAdminBorrowingApiTest(BaseBorrowingAPITest):
         )
 
         self.assertEqual(response_active.status_code, status.HTTP_200_OK)
-        self.assertEqual(response_active.data, serializer_active.data)
+        self.assertEqual(
+            response_active.data["results"], serializer_active.data
+        )
 
         self.assertEqual(response_inactive.status_code, status.HTTP_200_OK)
-        self.assertEqual(response_inactive.data, serializer_inactive.data)
+        self.assertEqual(
+            response_inactive.data["results"], serializer_inactive.data
+        )
+
+
+class OverdueBorrowingsTaskTest(BaseBorrowingAPITest):
+    def test_pack_messages_respects_limit(self):
+        entries = [f"entry {index} " + "x" * 40 for index in range(50)]
+        digests = list(pack_messages(entries, header="Header:", limit=200))
+
+        self.assertTrue(all(len(digest) <= 200 for digest in digests))
+        self.assertTrue(
+            all(digest.startswith("Header:") for digest in digests)
+        )
+        packed = "".join(digests)
+        self.assertTrue(all(entry in packed for entry in entries))
+
+    def test_pack_messages_truncates_oversized_entry(self):
+        digests = list(pack_messages(["y" * 500], limit=100))
+
+        self.assertEqual(len(digests), 1)
+        self.assertLessEqual(len(digests[0]), 100)
+
+    @mock.patch("borrowings.tasks.send_telegram_digest.delay")
+    def test_overdue_borrowings_are_sent_as_digests(self, delay):
+        Borrowing.objects.update(
+            expected_return_date=datetime.now().date()
+        )
+
+        digests_sent = check_overdue_borrowings()
+
+        self.assertEqual(digests_sent, 1)
+        delay.assert_called_once()
+        digest = delay.call_args.args[0]
+        self.assertEqual(digest.count(self.book.title), 2)
+        self.assertIn(self.user.email, digest)
+
+    @mock.patch("borrowings.tasks.send_telegram_digest.delay")
+    def test_no_overdue_borrowings_message(self, delay):
+        check_overdue_borrowings()
+
+        delay.assert_called_once_with("No borrowings overdue today!")
+
+
+@override_settings(
+    TELEGRAM_TRANSPORT="borrowings.notifier.FakeTransport",
+    TELEGRAM_MIN_SEND_INTERVAL=0,
+)
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        reset_notifier()
+
+    def test_notification_is_written_with_the_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue_notification("Hello")
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(
+            Notification.objects.filter(
+                text="Hello", sent_at__isnull=True
+            ).exists()
+        )
+
+    def test_drain_marks_notifications_sent(self):
+        Notification.objects.create(text="First")
+        Notification.objects.create(text="Second")
+
+        sent = drain_notification_outbox()
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(
+            [data["text"] for data in get_notifier().transport.sent],
+            ["First", "Second"],
+        )
+        self.assertFalse(
+            Notification.objects.filter(sent_at__isnull=True).exists()
+        )
+
+    def test_drain_backs_off_failed_notifications(self):
+        notification = Notification.objects.create(text="Failing")
+        transport = get_notifier().transport
+        transport.responses.append(
+            {"ok": False, "description": "Bad Request"}
+        )
+
+        drain_notification_outbox()
+        notification.refresh_from_db()
+
+        self.assertIsNone(notification.sent_at)
+        self.assertEqual(notification.attempts, 1)
+        self.assertEqual(notification.last_error, "Bad Request")
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+        drain_notification_outbox()
+        self.assertEqual(len(transport.sent), 1)
+
+    def test_delivery_happens_outside_the_claim_transaction(self):
+        notification = Notification.objects.create(text="Leased")
+        # TestCase wraps every test in atomic blocks of its own.
+        depth = len(connection.savepoint_ids)
+        delivered_in_atomic = []
+
+        def deliver(claimed):
+            delivered_in_atomic.append(
+                len(connection.savepoint_ids) > depth
+            )
+            claimed.refresh_from_db()
+            # Leased: another worker would not pick it up meanwhile.
+            self.assertGreater(claimed.next_attempt_at, timezone.now())
+            return None
+
+        with mock.patch(
+            "borrowings.tasks.deliver_notification", side_effect=deliver
+        ):
+            self.assertEqual(drain_notification_outbox(), 1)
+
+        self.assertEqual(delivered_in_atomic, [False])
+        notification.refresh_from_db()
+        self.assertIsNotNone(notification.sent_at)
+
+
+@override_settings(
+    TELEGRAM_TRANSPORT="borrowings.notifier.FakeTransport",
+    TELEGRAM_MIN_SEND_INTERVAL=0,
+)
+class TelegramNotifierTest(TestCase):
+    def setUp(self):
+        reset_notifier()
+
+    def test_notifier_is_shared(self):
+        self.assertIs(get_notifier(), get_notifier())
+
+    @mock.patch("borrowings.notifier.time.sleep")
+    def test_short_retry_after_is_honoured(self, sleep):
+        transport = get_notifier().transport
+        transport.responses.append(
+            {"ok": False, "parameters": {"retry_after": 2}}
+        )
+
+        result = send_telegram_message("Hello")
+
+        self.assertTrue(result["ok"])
+        self.assertEqual(len(transport.sent), 2)
+        self.assertAlmostEqual(sleep.call_args.args[0], 2, places=1)
+
+    def test_long_retry_after_is_raised(self):
+        transport = get_notifier().transport
+        transport.responses.append(
+            {"ok": False, "parameters": {"retry_after": 60}}
+        )
+
+        with self.assertRaises(TelegramRateLimited):
+            send_telegram_message("Hello")
+        with self.assertRaises(TelegramRateLimited):
+            send_telegram_message("Hello again")
+        self.assertEqual(len(transport.sent), 1)
+
+
+@mock.patch("borrowings.serializers.create_borrowing_checkout")
+class ConcurrentBorrowingTest(TransactionTestCase):
+    workers = 8
+    requests_count = 24
+    max_attempts = 50
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Popular Book",
+            author="Test Author",
+            cover="SOFT",
+            inventory=5,
+            daily_fee=1,
+        )
+        self.user = get_user_model().objects.create_user(
+            email="reader@example.com",
+            password="password123",
+        )
+        self.create_url = reverse("borrowings:borrowing-create")
+        self.data = {
+            "expected_return_date": (
+                datetime.now() + timedelta(days=7)
+            ).date(),
+            "book": self.book.id,
+            "user": self.user.id,
+        }
+
+    def _borrow(self, _):
+        # The test client reports view exceptions through a global signal,
+        # which mixes them up between threads, so look at status codes
+        # instead.
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user=self.user)
+        try:
+            for _ in range(self.max_attempts):
+                response = client.post(self.create_url, self.data)
+                # SQLite's shared in-memory test database rejects
+                # concurrent writers instead of waiting; retry the request
+                # like a client would.
+                if response.status_code < 500:
+                    break
+            return response.status_code
+        finally:
+            connection.close()
+
+    def test_parallel_borrowings_never_oversell(self, checkout_task):
+        request_logger = logging.getLogger("django.request")
+        with mock.patch.object(
+            request_logger, "disabled", True
+        ), ThreadPoolExecutor(max_workers=self.workers) as executor:
+            statuses = list(
+                executor.map(self._borrow, range(self.requests_count))
+            )
+
+        self.book.refresh_from_db()
+        created = statuses.count(status.HTTP_201_CREATED)
+
+        self.assertEqual(created, 5)
+        self.assertEqual(self.book.inventory, 0)
+        self.assertEqual(Borrowing.objects.filter(book=self.book).count(), 5)
+
+
+class AsyncBorrowingViewsTest(BaseBorrowingAPITest):
+    def setUp(self):
+        super().setUp()
+        self.other = get_user_model().objects.create_user(
+            email="other@example.com", password="password123"
+        )
+
+    async def test_list_is_limited_to_own_borrowings_and_revalidates(self):
+        await Borrowing.objects.acreate(
+            expected_return_date=self.borrowing_data["expected_return_date"],
+            book=self.book,
+            user=self.other,
+        )
+        view = AsyncBorrowingListView.as_view()
+
+        request = AsyncRequestFactory().get(self.borrowing_list_url)
+        force_authenticate(request, user=self.user)
+        response = await view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            [self.borrowing_1.id, self.borrowing_2.id],
+        )
+
+        request = AsyncRequestFactory().get(
+            self.borrowing_list_url,
+            headers={"If-None-Match": response["ETag"]},
+        )
+        force_authenticate(request, user=self.user)
+        response = await view(request)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_detail_checks_the_owner(self):
+        view = AsyncBorrowingRetrieveView.as_view()
+
+        for user, expected in (
+            (self.user, status.HTTP_200_OK),
+            (self.other, status.HTTP_403_FORBIDDEN),
+        ):
+            request = AsyncRequestFactory().get(self.borrowing_detail_url)
+            force_authenticate(request, user=user)
+            response = await view(request, pk=self.borrowing_1.id)
+            self.assertEqual(response.status_code, expected)
+
+
+class BorrowingCheckoutTaskTest(BaseBorrowingAPITest):
+    @mock.patch("borrowings.tasks.create_stripe_session")
+    def test_checkout_session_is_attached(self, create_stripe_session):
+        create_stripe_session.return_value = mock.Mock(
+            id="cs_test_1", url="https://checkout.stripe.com/cs_test_1"
+        )
+
+        create_borrowing_checkout.apply(args=(self.borrowing_1.id,))
+        self.borrowing_1.refresh_from_db()
+
+        self.assertEqual(
+            self.borrowing_1.checkout_status,
+            Borrowing.CheckoutStatusChoices.READY,
+        )
+        payment = self.borrowing_1.payments.get()
+        self.assertEqual(payment.session_id, "cs_test_1")
+        self.assertEqual(payment.money_to_pay, self.book.daily_fee)
+
+    @mock.patch(
+        "borrowings.tasks.create_stripe_session",
+        side_effect=PaymentGatewayUnavailable("Stripe is down"),
+    )
+    def test_checkout_failure_releases_the_copy(self, create_stripe_session):
+        create_borrowing_checkout.apply(args=(self.borrowing_1.id,))
+        self.borrowing_1.refresh_from_db()
+        self.book.refresh_from_db()
+
+        self.assertEqual(create_stripe_session.call_count, 4)
+        self.assertEqual(
+            self.borrowing_1.checkout_status,
+            Borrowing.CheckoutStatusChoices.FAILED,
+        )
+        self.assertEqual(self.book.inventory, 4)
+        self.assertFalse(self.borrowing_1.payments.exists())
+
+    @mock.patch(
+        "borrowings.tasks.create_stripe_session",
+        side_effect=PaymentGatewayError("Invalid request"),
+    )
+    def test_rejected_checkout_is_not_retried(self, create_stripe_session):
+        create_borrowing_checkout.apply(args=(self.borrowing_1.id,))
+        self.borrowing_1.refresh_from_db()
+
+        self.assertEqual(create_stripe_session.call_count, 1)
+        self.assertEqual(
+            self.borrowing_1.checkout_status,
+            Borrowing.CheckoutStatusChoices.FAILED,
+        )
+
+    @mock.patch("payments.helpers.get_gateway")
+    def test_bulk_checkout_key_fits_stripe_limit(self, get_gateway):
+        borrowings = [
+            mock.Mock(id=100000 + number, book=self.book)
+            for number in range(50)
+        ]
+
+        create_stripe_session(*borrowings)
+        create_stripe_session(*reversed(borrowings))
+
+        first, retry = (
+            call.kwargs["idempotency_key"]
+            for call in (
+                get_gateway().create_checkout_session.call_args_list
+            )
+        )
+        self.assertEqual(first, retry)
+        self.assertLessEqual(len(first), 255)
+
+    @mock.patch("borrowings.tasks.create_borrowing_checkout.delay")
+    def test_stuck_checkouts_are_retried_then_cancelled(self, delay):
+        now = timezone.now()
+        Borrowing.objects.filter(pk=self.borrowing_1.pk).update(
+            updated_at=now - timedelta(minutes=15)
+        )
+        Borrowing.objects.filter(pk=self.borrowing_2.pk).update(
+            updated_at=now - timedelta(hours=2)
+        )
+
+        self.assertEqual(recover_pending_checkouts.apply().get(), (1, 1))
+
+        delay.assert_called_once_with(self.borrowing_1.id)
+        self.borrowing_2.refresh_from_db()
+        self.assertEqual(
+            self.borrowing_2.checkout_status,
+            Borrowing.CheckoutStatusChoices.FAILED,
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 4)
+
+
+class ExplainQueriesCommandTest(TestCase):
+    def test_plans_are_printed_for_every_query(self):
+        out = StringIO()
+
+        call_command("explain_queries", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("borrowings: overdue check", output)
+        self.assertIn("payments: stripe session lookup", output)
+
+
+class BorrowingConditionalGetTest(BaseBorrowingAPITest):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+        self.active_url = f"{self.borrowing_list_url}?is_active=true"
+
+    def test_list_returns_not_modified_without_serializing(self):
+        response = self.client.get(self.active_url)
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with mock.patch.object(
+            BorrowingListSerializer, "to_representation"
+        ) as to_representation:
+            response = self.client.get(
+                self.active_url, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+
+    def test_return_changes_list_etag(self):
+        etag = self.client.get(self.active_url)["ETag"]
+
+        self.client.force_authenticate(user=self.admin)
+        self.client.put(self.borrowing_return_url)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.active_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_book_rename_changes_list_etag(self):
+        etag = self.client.get(self.active_url)["ETag"]
+
+        self.book.title = "Renamed Book"
+        self.book.save()
+        response = self.client.get(self.active_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"][0]["book"], "Renamed Book"
+        )
+
+    def test_list_validators_only_aggregate_the_page(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.active_url, {"page_size": 1})
+
+        [validators] = [
+            query["sql"]
+            for query in context.captured_queries
+            if "MAX(" in query["sql"]
+        ]
+        self.assertIn("LIMIT 2", validators)
+
+    def test_return_from_the_page_changes_list_etag(self):
+        other_book = Book.objects.create(
+            title="Other Book",
+            author="Test Author",
+            cover="SOFT",
+            inventory=3,
+            daily_fee=5,
+        )
+        Borrowing.objects.create(**{**self.borrowing_data, "book": other_book})
+        Borrowing.objects.filter(pk=self.borrowing_2.pk).update(
+            book=other_book
+        )
+        # Same timestamps on both pages: only the listed rows differ.
+        now = timezone.now()
+        Borrowing.objects.update(updated_at=now)
+        Book.objects.filter(pk=self.book.pk).update(
+            updated_at=now - timedelta(hours=1)
+        )
+        Book.objects.filter(pk=other_book.pk).update(updated_at=now)
+        page_url = f"{self.active_url}&page_size=1"
+        response = self.client.get(page_url)
+        self.assertEqual(
+            response.data["results"][0]["id"], self.borrowing_1.id
+        )
+
+        self.client.force_authenticate(user=self.admin)
+        self.client.put(self.borrowing_return_url)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            page_url, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"][0]["id"], self.borrowing_2.id
+        )
+
+    def test_new_payment_changes_detail_etag(self):
+        etag = self.client.get(self.borrowing_detail_url)["ETag"]
+        self.assertEqual(
+            self.client.get(
+                self.borrowing_detail_url, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+        Payment.objects.create(
+            status=Payment.StatusChoices.PENDING,
+            type=Payment.TypeChoices.FINE,
+            borrowing=self.borrowing_1,
+            money_to_pay=5,
+        )
+        response = self.client.get(
+            self.borrowing_detail_url, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["payments"]), 1)
+
+
+class BulkBorrowingTest(BaseBorrowingAPITest):
+    def setUp(self):
+        super().setUp()
+        self.other_book = Book.objects.create(
+            title="Other Book",
+            author="Test Author",
+            cover="SOFT",
+            inventory=1,
+            daily_fee=2,
+        )
+        self.bulk_create_url = reverse("borrowings:borrowing-bulk-create")
+        self.bulk_return_url = reverse("borrowings:borrowing-bulk-return")
+        self.return_date = (datetime.now() + timedelta(days=7)).date()
+
+    def _items(self, *book_ids):
+        return {
+            "items": [
+                {"book": book_id, "expected_return_date": self.return_date}
+                for book_id in book_ids
+            ]
+        }
+
+    @mock.patch("borrowings.serializers.create_bulk_checkout.delay")
+    def test_bulk_create_reserves_all_copies_at_once(self, delay):
+        self.client.force_authenticate(user=self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    self.bulk_create_url,
+                    self._items(
+                        self.book.id, self.book.id, self.other_book.id
+                    ),
+                    format="json",
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        book_updates = [
+            query
+            for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "books_book"')
+        ]
+        self.assertEqual(len(book_updates), 1)
+        self.book.refresh_from_db()
+        self.other_book.refresh_from_db()
+        self.assertEqual(
+            (self.book.inventory, self.other_book.inventory), (1, 0)
+        )
+        delay.assert_called_once_with([item["id"] for item in response.data])
+        self.assertEqual(Notification.objects.count(), 1)
+
+    @mock.patch("borrowings.serializers.create_bulk_checkout.delay")
+    def test_bulk_create_replays_idempotency_key(self, delay):
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        items = self._items(self.book.id, self.other_book.id)
+
+        first, replay = (
+            self.client.post(
+                self.bulk_create_url,
+                items,
+                format="json",
+                HTTP_IDEMPOTENCY_KEY="bulk-1",
+            )
+            for _ in range(2)
+        )
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(Borrowing.objects.count(), 4)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 2)
+
+    def test_bulk_create_takes_nothing_without_enough_copies(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(
+            self.bulk_create_url,
+            self._items(self.book.id, self.other_book.id, self.other_book.id),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 3)
+        self.assertEqual(Borrowing.objects.count(), 2)
+
+    def test_reserve_copies_rolls_back_partial_updates(self):
+        reserved = Book.reserve_copies(
+            {self.book.id: 1, self.other_book.id: 2}
+        )
+
+        self.assertFalse(reserved)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 3)
+
+    @mock.patch("borrowings.tasks.create_stripe_session")
+    def test_bulk_checkout_shares_one_stripe_session(
+        self, create_stripe_session
+    ):
+        create_stripe_session.return_value = mock.Mock(
+            id="cs_test_bulk", url="https://checkout.stripe.com/cs_test_bulk"
+        )
+
+        create_bulk_checkout.apply(
+            args=([self.borrowing_1.id, self.borrowing_2.id],)
+        )
+
+        create_stripe_session.assert_called_once()
+        self.assertEqual(
+            Payment.objects.filter(session_id="cs_test_bulk").count(), 2
+        )
+        self.assertFalse(
+            Borrowing.objects.exclude(
+                checkout_status=Borrowing.CheckoutStatusChoices.READY
+            ).exists()
+        )
+
+    def test_bulk_return_releases_copies_and_fines_overdue(self):
+        Borrowing.objects.filter(pk=self.borrowing_1.pk).update(
+            borrow_date=datetime.now().date() - timedelta(days=10),
+            expected_return_date=datetime.now().date() - timedelta(days=2),
+        )
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.post(
+            self.bulk_return_url,
+            {"ids": [self.borrowing_1.id, self.borrowing_2.id]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 5)
+        fine = Payment.objects.get(type=Payment.TypeChoices.FINE)
+        self.assertEqual(fine.borrowing_id, self.borrowing_1.id)
+        self.assertEqual(str(fine.money_to_pay), "11.00")
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_bulk_return_rejects_returned_borrowings(self):
+        Borrowing.objects.filter(pk=self.borrowing_2.pk).update(
+            actual_return_date=datetime.now().date()
+        )
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.post(
+            self.bulk_return_url,
+            {"ids": [self.borrowing_1.id, self.borrowing_2.id]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 3)
+
+
+class BorrowingExportTest(BaseBorrowingAPITest):
+    def setUp(self):
+        super().setUp()
+        self.export_url = reverse("borrowings:borrowing-export")
+        Borrowing.objects.filter(pk=self.borrowing_2.pk).update(
+            actual_return_date=datetime.now().date()
+        )
+
+    def _export(self, **params):
+        response = self.client.get(self.export_url, params)
+        content = b"".join(response.streaming_content).decode()
+        return response, content.splitlines()
+
+    def test_export_streams_filtered_rows(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response, lines = self._export(is_active="true")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(lines[0].split(",")[:2], ["id", "borrow_date"])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f"{self.borrowing_1.id},"))
+        self.assertIn("user@example.com", lines[1])
+
+    def test_export_rejects_inverted_date_range(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(
+            self.export_url,
+            {"date_from": "2024-02-01", "date_to": "2024-01-01"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_is_for_admins_only(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.export_url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BookStatsTest(BaseBorrowingAPITest):
+    def _stats(self):
+        return BookStats.objects.get(book=self.book)
+
+    @mock.patch("borrowings.serializers.create_borrowing_checkout.delay")
+    def test_borrow_and_return_update_counters(self, _):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse("borrowings:borrowing-create"), self.borrowing_data_2
+        )
+
+        stats = self._stats()
+        self.assertEqual((stats.active_loans, stats.total_loans), (1, 1))
+        self.assertEqual(
+            stats.next_due_date, self.borrowing_data_2["expected_return_date"]
+        )
+
+        self.client.force_authenticate(user=self.admin)
+        self.client.put(
+            reverse("borrowings:borrowing-return", args=[response.data["id"]])
+        )
+
+        stats = self._stats()
+        self.assertEqual((stats.active_loans, stats.total_loans), (0, 1))
+        # Recomputed from the loans still open, borrowing_1 and borrowing_2.
+        self.assertEqual(
+            stats.next_due_date, self.borrowing_1.expected_return_date
+        )
+
+    def test_reconcile_rebuilds_counters_with_one_grouped_query(self):
+        Borrowing.objects.filter(pk=self.borrowing_1.pk).update(
+            borrow_date=datetime.now().date() - timedelta(days=10),
+            expected_return_date=datetime.now().date() - timedelta(days=2),
+        )
+
+        call_command("reconcile_book_stats", stdout=StringIO())
+
+        stats = self._stats()
+        self.assertEqual(
+            (stats.active_loans, stats.overdue_loans, stats.total_loans),
+            (2, 1, 2),
+        )
+        self.assertEqual(
+            stats.next_due_date,
+            datetime.now().date() - timedelta(days=2),
+        )
+
+    def test_overdue_counts_follow_the_calendar(self):
+        call_command("reconcile_book_stats", stdout=StringIO())
+        Borrowing.objects.filter(pk=self.borrowing_1.pk).update(
+            borrow_date=datetime.now().date() - timedelta(days=10),
+            expected_return_date=datetime.now().date() - timedelta(days=2),
+        )
+
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_book_overdue_counts.apply()
+
+        self.assertEqual(self._stats().overdue_loans, 1)
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_counters_are_exposed_on_books(self):
+        call_command("reconcile_book_stats", stdout=StringIO())
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(
+            reverse("books:book-detail", args=[self.book.id])
+        )
+
+        self.assertEqual(response.data["active_loans"], 2)
+        self.assertEqual(response.data["overdue_loans"], 0)
+
+    def test_books_without_loans_expose_zero_counters(self):
+        book = Book.objects.create(
+            title="Never Borrowed",
+            author="Test Author",
+            cover="SOFT",
+            inventory=1,
+            daily_fee=1,
+        )
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(
+            reverse("books:book-detail", args=[book.id])
+        )
+
+        self.assertEqual(response.data["active_loans"], 0)
+        self.assertEqual(response.data["overdue_loans"], 0)
+        self.assertIsNone(response.data["next_due_date"])
@@ -1,18 +1,48 @@
 from django.urls import path
 
 from borrowings.views import (
+    AsyncBorrowingListView,
+    AsyncBorrowingRetrieveView,
+    BorrowingBulkCreateView,
+    BorrowingBulkReturnView,
     BorrowingCreateView,
+    BorrowingExportView,
     BorrowingRetrieveView,
     BorrowingListView,
     BorrowingReturnView,
 )
+from library_manage.async_views import route_reads
 
 urlpatterns = [
-    path("", BorrowingListView.as_view(), name="borrowing-list"),
     path(
-        "<int:pk>/", BorrowingRetrieveView.as_view(), name="borrowing-detail"
+        "",
+        route_reads(
+            AsyncBorrowingListView.as_view(), BorrowingListView.as_view()
+        ),
+        name="borrowing-list",
+    ),
+    path(
+        "<int:pk>/",
+        route_reads(
+            AsyncBorrowingRetrieveView.as_view(),
+            BorrowingRetrieveView.as_view(),
+        ),
+        name="borrowing-detail",
     ),
     path("create/", BorrowingCreateView.as_view(), name="borrowing-create"),
+    path(
+        "export/", BorrowingExportView.as_view(), name="borrowing-export"
+    ),
+    path(
+        "bulk/create/",
+        BorrowingBulkCreateView.as_view(),
+        name="borrowing-bulk-create",
+    ),
+    path(
+        "bulk/return/",
+        BorrowingBulkReturnView.as_view(),
+        name="borrowing-bulk-return",
+    ),
     path(
         "<int:pk>/return/",
         BorrowingReturnView.as_view(),
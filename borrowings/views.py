@@ -1,40 +1,97 @@
+from django.db import transaction
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema
-from rest_framework import generics
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
 
-from borrowings.helpers import send_telegram_message
 from borrowings.models import Borrowing
+from borrowings.outbox import enqueue_notification
+from borrowings.pagination import BorrowingPagination
 from borrowings.permissions import IsAdminOrOwnerUser
 from borrowings.serializers import (
     BorrowingListSerializer,
     BorrowingRetrieveSerializer,
     BorrowingCreateSerializer,
     BorrowingReturnSerializer,
+    BorrowingBulkCreateSerializer,
+    BorrowingBulkReturnSerializer,
+    BorrowingExportFilterSerializer,
 )
+from library_manage.async_views import (
+    AsyncGenericAPIView,
+    AsyncListMixin,
+    AsyncRetrieveMixin,
+)
+from library_manage.conditional import ConditionalGetMixin
+from library_manage.db_routers import ReplicaReadMixin
+from library_manage.idempotency import IdempotentPostMixin
+from library_manage.streaming import ExportAPIView
+from payments.serializers import PaymentSerializer
 
 
-class BorrowingCreateView(generics.CreateAPIView):
+class BorrowingCreateView(IdempotentPostMixin, generics.CreateAPIView):
     queryset = Borrowing.objects.all()
     serializer_class = BorrowingCreateSerializer
     permission_classes = (IsAuthenticated,)
 
     def perform_create(self, serializer):
-        borrowing = serializer.save(user=self.request.user)
+        with transaction.atomic():
+            borrowing = serializer.save(user=self.request.user)
 
-        message = (
-            f"New borrowing created for book '{borrowing.book.title}'. "
-            f"Must Return: {borrowing.expected_return_date}"
-        )
-        send_telegram_message(message)
+            message = (
+                f"New borrowing created for book '{borrowing.book.title}'. "
+                f"Must Return: {borrowing.expected_return_date}"
+            )
+            enqueue_notification(message)
 
 
-class BorrowingListView(generics.ListAPIView):
-    serializer_class = BorrowingListSerializer
+class BorrowingBulkCreateView(IdempotentPostMixin, generics.GenericAPIView):
+    serializer_class = BorrowingBulkCreateSerializer
     permission_classes = (IsAuthenticated,)
 
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            borrowings = serializer.save(user=request.user)
+
+            titles = {
+                book.id: book.title
+                for book in serializer.validated_data["books"].values()
+            }
+            lines = "\n".join(
+                f"- '{titles[borrowing.book_id]}', "
+                f"must return: {borrowing.expected_return_date}"
+                for borrowing in borrowings
+            )
+            enqueue_notification(
+                f"{len(borrowings)} borrowings created for "
+                f"{request.user.email}:\n{lines}"
+            )
+
+        return Response(
+            BorrowingCreateSerializer(borrowings, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class BorrowingListQuerysetMixin:
     def get_queryset(self):
-        queryset = Borrowing.objects.all()
+        queryset = (
+            Borrowing.objects.select_related("book")
+            .only(
+                "id",
+                "borrow_date",
+                "expected_return_date",
+                "actual_return_date",
+                "checkout_status",
+                "user",
+                "book__title",
+            )
+            .prefetch_related("payments")
+        )
 
         if not self.request.user.is_staff:
             queryset = queryset.filter(user=self.request.user)
@@ -52,6 +109,19 @@ class BorrowingListView(generics.ListAPIView):
 
         return queryset
 
+
+class BorrowingListView(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    BorrowingListQuerysetMixin,
+    generics.ListAPIView,
+):
+    serializer_class = BorrowingListSerializer
+    pagination_class = BorrowingPagination
+    permission_classes = (IsAuthenticated,)
+    # The list renders the book title.
+    last_modified_fields = ("updated_at", "book__updated_at")
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -71,13 +141,99 @@ class BorrowingListView(generics.ListAPIView):
         return super().list(request, *args, **kwargs)
 
 
-class BorrowingRetrieveView(generics.RetrieveAPIView):
-    queryset = Borrowing.objects.all()
+class BorrowingRetrieveView(ConditionalGetMixin, generics.RetrieveAPIView):
+    queryset = Borrowing.objects.select_related(
+        "book__stats", "user"
+    ).prefetch_related("payments")
+    serializer_class = BorrowingRetrieveSerializer
+    permission_classes = (IsAdminOrOwnerUser,)
+    last_modified_fields = ("updated_at", "book__updated_at")
+
+
+class AsyncBorrowingListView(
+    ConditionalGetMixin,
+    BorrowingListQuerysetMixin,
+    AsyncListMixin,
+    AsyncGenericAPIView,
+):
+    serializer_class = BorrowingListSerializer
+    pagination_class = BorrowingPagination
+    permission_classes = (IsAuthenticated,)
+    last_modified_fields = BorrowingListView.last_modified_fields
+    replica_reads = True
+
+
+class AsyncBorrowingRetrieveView(
+    ConditionalGetMixin, AsyncRetrieveMixin, AsyncGenericAPIView
+):
+    queryset = BorrowingRetrieveView.queryset
     serializer_class = BorrowingRetrieveSerializer
     permission_classes = (IsAdminOrOwnerUser,)
+    last_modified_fields = BorrowingRetrieveView.last_modified_fields
 
 
 class BorrowingReturnView(generics.UpdateAPIView):
-    queryset = Borrowing.objects.all()
+    queryset = Borrowing.objects.select_related("book")
     serializer_class = BorrowingReturnSerializer
     permission_classes = (IsAdminUser,)
+
+
+class BorrowingBulkReturnView(generics.GenericAPIView):
+    serializer_class = BorrowingBulkReturnSerializer
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            borrowings, fines = serializer.save()
+
+            lines = "\n".join(
+                f"- '{borrowing.book.title}'" for borrowing in borrowings
+            )
+            enqueue_notification(
+                f"{len(borrowings)} borrowings returned, "
+                f"{len(fines)} fines issued:\n{lines}"
+            )
+
+        return Response(
+            {
+                "returned": [borrowing.id for borrowing in borrowings],
+                "fines": PaymentSerializer(fines, many=True).data,
+            }
+        )
+
+
+class BorrowingExportView(ReplicaReadMixin, ExportAPIView):
+    queryset = Borrowing.objects.all()
+    filter_serializer_class = BorrowingExportFilterSerializer
+    filename = "borrowings"
+    export_fields = (
+        "id",
+        "borrow_date",
+        "expected_return_date",
+        "actual_return_date",
+        "checkout_status",
+        "book_id",
+        "book__title",
+        "user_id",
+        "user__email",
+    )
+
+    def filter_export_queryset(self, queryset, filters):
+        if "date_from" in filters:
+            queryset = queryset.filter(borrow_date__gte=filters["date_from"])
+        if "date_to" in filters:
+            queryset = queryset.filter(borrow_date__lte=filters["date_to"])
+        if filters.get("is_active") is not None:
+            queryset = queryset.filter(
+                actual_return_date__isnull=filters["is_active"]
+            )
+        if "checkout_status" in filters:
+            queryset = queryset.filter(
+                checkout_status=filters["checkout_status"]
+            )
+        if "user_id" in filters:
+            queryset = queryset.filter(user_id=filters["user_id"])
+        return queryset
@@ -0,0 +1,135 @@
+import functools
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404
+from rest_framework import generics
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from library_manage.db_routers import read_from_replica
+
+READ_METHODS = ("GET", "HEAD")
+
+
+class AsyncAPIView(APIView):
+    """
+    ``APIView`` whose handlers are coroutines, so Django serves it
+    natively under ASGI instead of through a thread per request.
+
+    Authentication, permissions and throttling still run in
+    ``initial()``; they are synchronous (cache or database lookups) and
+    run in one worker thread hop. Handlers must use the async ORM.
+    """
+
+    # Serve safe requests from the read replicas, like ReplicaReadMixin.
+    replica_reads = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        if self.replica_reads and request.method in SAFE_METHODS:
+            with read_from_replica():
+                response = await self._handle(request, *args, **kwargs)
+        else:
+            response = await self._handle(request, *args, **kwargs)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    async def _handle(self, request, *args, **kwargs):
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = self.http_method_not_allowed
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return response
+
+
+class AsyncGenericAPIView(AsyncAPIView, generics.GenericAPIView):
+    async def aget_list_queryset(self):
+        """Filtered list queryset; override when building it needs I/O."""
+        return self.filter_queryset(self.get_queryset())
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self
+        )
+
+
+class AsyncListMixin:
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.aget_list_queryset()
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        instances = [instance async for instance in queryset]
+        return Response(self.get_serializer(instances, many=True).data)
+
+
+class AsyncRetrieveMixin:
+    async def get(self, request, *args, **kwargs):
+        return await self.aretrieve(request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+
+def route_reads(read_view, write_view):
+    """
+    Serve GET and HEAD with the async ``read_view`` and every other
+    method with the synchronous ``write_view``, when ASYNC_READ_VIEWS is
+    on. Under WSGI that setting is left off: an async view there costs an
+    event loop per request.
+
+    The returned view carries the attributes of ``write_view`` (``cls``,
+    ``actions``...), so the schema still documents the endpoint.
+    """
+    if not settings.ASYNC_READ_VIEWS:
+        return write_view
+
+    write = sync_to_async(write_view)
+
+    @functools.wraps(write_view)
+    async def view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await read_view(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    return view
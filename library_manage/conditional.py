@@ -0,0 +1,181 @@
+import hashlib
+
+from django.db.models import Count, Max, Min, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from library_manage.pagination import KeysetPagination
+
+
+def make_etag(*parts):
+    digest = hashlib.sha256(
+        "|".join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    """Return a 304 (or 412) response if the request's validators match."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(
+            int(last_modified.timestamp()) if last_modified else None
+        ),
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Add ETag and Last-Modified validators to list and detail responses.
+
+    Validators come from the listed ids and row timestamps
+    (``last_modified_fields``) instead of the rendered body, so a
+    matching ``If-None-Match`` or ``If-Modified-Since`` is answered with
+    304 before anything is serialized. A list costs one aggregate query
+    over the requested page (see ``get_validator_queryset``), a detail
+    costs nothing beyond loading the object.
+    ``alist`` and ``aretrieve`` do the same for async views.
+    """
+
+    last_modified_fields = ("updated_at",)
+
+    def get_validator_scope(self, request):
+        return (
+            request.get_full_path(),
+            request.accepted_media_type,
+            request.user.pk,
+        )
+
+    def _get_list_aggregates(self):
+        return {
+            f"last_modified_{index}": Max(field)
+            for index, field in enumerate(self.last_modified_fields)
+        }
+
+    def _get_row_aggregates(self):
+        # Which rows are listed: when one leaves a page, the next one
+        # slides in, and the count and timestamps can stay the same.
+        return {
+            "count": Count("pk"),
+            "min_pk": Min("pk"),
+            "max_pk": Max("pk"),
+            "sum_pk": Sum("pk"),
+        }
+
+    def _make_list_validators(self, request, values, aggregates):
+        last_modified = max(
+            filter(None, (values[key] for key in aggregates)), default=None
+        )
+        etag = make_etag(
+            *self.get_validator_scope(request),
+            *(values[key] for key in self._get_row_aggregates()),
+            *(values[key] for key in aggregates),
+        )
+        return etag, last_modified
+
+    def get_validator_queryset(self, request, queryset):
+        """
+        Rows the list response is built from. Under keyset pagination
+        that is the page query itself (its rows after the cursor, plus
+        one for the next link), so the validators cost as much as the
+        page whatever the size of the filtered table. Without it, the
+        whole filtered queryset is aggregated.
+        """
+        if isinstance(self.paginator, KeysetPagination):
+            page_queryset = self.paginator.get_page_queryset(
+                queryset, request, self
+            )
+            if page_queryset is not None:
+                return page_queryset
+        return queryset.order_by()
+
+    def get_list_validators(self, request, queryset):
+        aggregates = self._get_list_aggregates()
+        values = self.get_validator_queryset(request, queryset).aggregate(
+            **self._get_row_aggregates(), **aggregates
+        )
+        return self._make_list_validators(request, values, aggregates)
+
+    async def aget_list_validators(self, request, queryset):
+        aggregates = self._get_list_aggregates()
+        values = await self.get_validator_queryset(
+            request, queryset
+        ).aaggregate(**self._get_row_aggregates(), **aggregates)
+        return self._make_list_validators(request, values, aggregates)
+
+    def get_object_validators(self, request, instance):
+        timestamps = []
+        for field in self.last_modified_fields:
+            value = instance
+            for attr in field.split("__"):
+                value = getattr(value, attr, None)
+            timestamps.append(value)
+        last_modified = max(filter(None, timestamps), default=None)
+        etag = make_etag(
+            *self.get_validator_scope(request), instance.pk, *timestamps
+        )
+        return etag, last_modified
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.get_list_validators(request, queryset)
+        not_modified = get_not_modified_response(
+            request, etag, last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validators(request, instance)
+        not_modified = get_not_modified_response(
+            request, etag, last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        return set_validators(response, etag, last_modified)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.aget_list_queryset()
+        etag, last_modified = await self.aget_list_validators(
+            request, queryset
+        )
+        not_modified = get_not_modified_response(
+            request, etag, last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = await super().alist(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        etag, last_modified = self.get_object_validators(request, instance)
+        not_modified = get_not_modified_response(
+            request, etag, last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        return set_validators(response, etag, last_modified)
@@ -0,0 +1,98 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADERS = ("Location",)
+
+
+def get_idempotency_cache_key(request, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{request.user.pk or 'anon'}:{request.path}:{digest}"
+
+
+def get_request_fingerprint(request):
+    return hashlib.sha256(
+        b"|".join((request.method.encode(), request.body))
+    ).hexdigest()
+
+
+class IdempotentPostMixin:
+    """
+    Honour an ``Idempotency-Key`` header on POST.
+
+    The first request with a key runs normally and its response is kept
+    in the cache for IDEMPOTENCY_KEY_TTL seconds, scoped to the user and
+    the path. Retries with the same key and body get that response back
+    without running the view again; the same key with another body is
+    rejected with 422, and a retry that arrives while the first request
+    is still running gets 409. Server errors are not kept, so they can be
+    retried.
+
+    The view does its work in ``create()`` (as the generic create views
+    already do) rather than in ``post()``, which belongs to the mixin.
+    """
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return self.create(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{HEADER} is longer than {MAX_KEY_LENGTH}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = get_idempotency_cache_key(request, key)
+        fingerprint = get_request_fingerprint(request)
+        in_progress = {"fingerprint": fingerprint, "status": None}
+        if not cache.add(
+            cache_key, in_progress, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT
+        ):
+            return self.replay(cache.get(cache_key), fingerprint)
+
+        try:
+            response = self.create(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+            return response
+        cache.set(
+            cache_key,
+            {
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "data": response.data,
+                "headers": {
+                    name: response[name]
+                    for name in REPLAYED_HEADERS
+                    if response.has_header(name)
+                },
+            },
+            timeout=settings.IDEMPOTENCY_KEY_TTL,
+        )
+        return response
+
+    def replay(self, stored, fingerprint):
+        if stored is None or stored["status"] is None:
+            return Response(
+                {"error": "A request with this key is still in progress."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if stored["fingerprint"] != fingerprint:
+            return Response(
+                {"error": f"{HEADER} was already used for another request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(
+            stored["data"], status=stored["status"], headers=stored["headers"]
+        )
+        response["Idempotent-Replayed"] = "true"
+        return response
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 import os
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -34,6 +35,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = ["localhost", "127.0.0.1"]
 
+# Public base URL, used for links built outside of a request (e.g. Stripe)
+SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -43,6 +47,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "django_celery_beat",
@@ -50,6 +55,7 @@ INSTALLED_APPS = [
     "users",
     "borrowings",
     "payments",
+    "reporting",
     "drf_spectacular",
 ]
 
@@ -88,12 +94,48 @@ WSGI_APPLICATION = "library_manage.wsgi.application"
 
 AUTH_USER_MODEL = "users.User"
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# PostgreSQL is used as soon as DB_HOST is set, SQLite otherwise.
+# DB_POOLER=pgbouncer is for a PgBouncer in transaction pooling mode,
+# which cannot keep server-side cursors open between transactions.
+# DB_REPLICA_HOSTS is a comma separated list of read replicas that
+# safe requests of ReplicaReadMixin views are routed to.
+DB_HOST = os.getenv("DB_HOST")
+DB_POOLER = os.getenv("DB_POOLER", "")
+
+if DB_HOST:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "HOST": DB_HOST,
+            "PORT": os.getenv("DB_PORT", "5432"),
+            "NAME": os.getenv("DB_NAME"),
+            "USER": os.getenv("DB_USER"),
+            "PASSWORD": os.getenv("DB_PASSWORD"),
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": True,
+            "DISABLE_SERVER_SIDE_CURSORS": DB_POOLER == "pgbouncer",
+            "OPTIONS": {
+                "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+            },
+        }
     }
-}
+    for index, replica_host in enumerate(
+        filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1
+    ):
+        DATABASES[f"replica_{index}"] = {
+            **DATABASES["default"],
+            "HOST": replica_host.strip(),
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+
+DATABASE_ROUTERS = ["library_manage.db_routers.PrimaryReplicaRouter"]
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -136,10 +178,30 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
+    "DEFAULT_RENDERER_CLASSES": [
+        "library_manage.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "library_manage.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "library_manage.pagination.KeysetPagination",
+    "PAGE_SIZE": 20,
 }
+# MessagePack (Accept: application/msgpack) for internal consumers,
+# offered only when msgpack is installed.
+if find_spec("msgpack"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append(
+        "library_manage.renderers.MessagePackRenderer"
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"].append(
+        "library_manage.renderers.MessagePackParser"
+    )
 
 # JWT Configurations
 # https://django-rest-framework-simplejwt.readthedocs.io/en/latest/settings.html
@@ -147,7 +209,11 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=240),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=3),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenRefreshSerializer",
 }
+# Seconds a JWT-authenticated user is served from the cache.
+AUTH_USER_CACHE_TIMEOUT = 60
 
 # Celery Configurations
 # https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
@@ -157,14 +223,165 @@ CELERY_TIMEZONE = "Europe/Kyiv"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Largest batch accepted by the bulk borrowing and bulk return endpoints
+BORROWING_BULK_MAX_ITEMS = 50
+
+# Rows fetched per round trip when streaming overdue borrowings
+OVERDUE_BORROWINGS_CHUNK_SIZE = 2000
+
+# Telegram notifications
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+TELEGRAM_TRANSPORT = os.getenv(
+    "TELEGRAM_TRANSPORT", "borrowings.notifier.RequestsTransport"
+)
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", 3.05))
+TELEGRAM_READ_TIMEOUT = float(os.getenv("TELEGRAM_READ_TIMEOUT", 10))
+TELEGRAM_POOL_SIZE = 10
+TELEGRAM_MIN_SEND_INTERVAL = 0.05  # seconds between messages per process
+TELEGRAM_MAX_RETRY_WAIT = 5  # longer retry_after hints are rescheduled
+
+# Telegram notification outbox
+NOTIFICATION_OUTBOX_BATCH_SIZE = 100
+NOTIFICATION_MAX_ATTEMPTS = 8
+NOTIFICATION_RETRY_BASE_DELAY = 30  # seconds, doubled on every attempt
+# Seconds a drained batch stays claimed by its worker
+NOTIFICATION_LEASE_TIMEOUT = 10 * 60
+
+# Borrowings still waiting for their checkout session: minutes before
+# the checkout is enqueued again, and before the borrowing is cancelled.
+CHECKOUT_RETRY_AFTER = 10
+CHECKOUT_EXPIRE_AFTER = 60
+CHECKOUT_RECOVERY_BATCH_SIZE = 500
+
 # Celery Beat Task
 CELERY_BEAT_SCHEDULE = {
     "check-overdue-borrowings-every-day": {
-        "task": "borrowing.tasks.check_overdue_borrowings",
+        "task": "borrowings.tasks.check_overdue_borrowings",
         "schedule": crontab(hour="10", minute="0"),
     },
+    "refresh-book-overdue-counts-every-day": {
+        "task": "borrowings.tasks.refresh_book_overdue_counts",
+        "schedule": crontab(hour="0", minute="5"),
+    },
+    "accrue-overdue-fines-every-night": {
+        "task": "payments.tasks.accrue_overdue_fines",
+        "schedule": crontab(hour="0", minute="10"),
+    },
+    "refresh-reports-every-ten-minutes": {
+        "task": "reporting.tasks.refresh_reports",
+        "schedule": crontab(minute="*/10"),
+    },
+    "process-stripe-events-every-minute": {
+        "task": "payments.tasks.process_stripe_events",
+        "schedule": crontab(),
+    },
+    "drain-notification-outbox-every-minute": {
+        "task": "borrowings.tasks.drain_notification_outbox",
+        "schedule": crontab(),
+    },
+    "recover-pending-checkouts-every-five-minutes": {
+        "task": "borrowings.tasks.recover_pending_checkouts",
+        "schedule": crontab(minute="*/5"),
+    },
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Defaults to the Redis that Celery uses as a broker; without Redis every
+# process falls back to its own in-memory cache.
+CACHE_URL = os.getenv("CACHE_URL") or (
+    CELERY_BROKER_URL
+    if CELERY_BROKER_URL and CELERY_BROKER_URL.startswith("redis")
+    else None
+)
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a rendered catalog page stays cached; any catalog change
+# invalidates it sooner by bumping the catalog version.
+CATALOG_CACHE_TIMEOUT = 5 * 60
+
+# Book search: shortest last term that is matched as a prefix, and the
+# cap on ranked matches of the in-process index used without PostgreSQL.
+BOOK_SEARCH_MIN_PREFIX = 2
+BOOK_SEARCH_MAX_RESULTS = 1000
+
+# Autocomplete prefix index: estimated size each process may spend on it
+# (least used titles and authors are left out beyond it) and how long the
+# snapshot shared through the cache lives before it is rebuilt.
+BOOK_AUTOCOMPLETE_MAX_BYTES = int(
+    os.getenv("BOOK_AUTOCOMPLETE_MAX_BYTES", 64 * 1024 * 1024)
+)
+BOOK_AUTOCOMPLETE_SNAPSHOT_TIMEOUT = 60 * 60
+
+# Payment gateway: dotted path of the class (payments.gateway.FakeGateway
+# for local runs and load tests), timeouts in seconds, circuit breaker
+# and whether checkout sessions are created by a worker.
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+PAYMENT_GATEWAY = os.getenv(
+    "PAYMENT_GATEWAY", "payments.gateway.StripeGateway"
+)
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = float(
+    os.getenv("PAYMENT_GATEWAY_CONNECT_TIMEOUT", 3.05)
+)
+PAYMENT_GATEWAY_READ_TIMEOUT = float(
+    os.getenv("PAYMENT_GATEWAY_READ_TIMEOUT", 10)
+)
+PAYMENT_GATEWAY_MAX_RETRIES = 1
+PAYMENT_GATEWAY_FAILURE_THRESHOLD = 5
+PAYMENT_GATEWAY_RESET_TIMEOUT = 30
+PAYMENT_GATEWAY_ASYNC = os.getenv("PAYMENT_GATEWAY_ASYNC", "") == "1"
+PAYMENT_GATEWAY_FAKE_LATENCY = float(
+    os.getenv("PAYMENT_GATEWAY_FAKE_LATENCY", 0)
+)
+
+# Serve the hottest reads (books, borrowings, /me) with async views.
+# Turned on by asgi.py; under WSGI every async view would need its own
+# event loop, so it stays off there.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "") == "1"
+
+# Idempotency-Key: how long responses are kept for replay, and how long
+# a key stays locked while its first request runs (seconds).
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# Stripe webhooks: signing secret of the endpoint and events applied per
+# worker batch.
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+STRIPE_EVENT_BATCH_SIZE = 500
+
+# Fines: days overdue past the grace period (capped at FINE_MAX_DAYS when
+# set) x the book's daily fee x FINE_MULTIPLIER, rounded to the cent.
+FINE_MULTIPLIER = os.getenv("FINE_MULTIPLIER", "1.1")
+FINE_GRACE_DAYS = int(os.getenv("FINE_GRACE_DAYS", 0))
+FINE_MAX_DAYS = int(os.getenv("FINE_MAX_DAYS", 0))
+FINE_BATCH_SIZE = 1000
+
+# Reporting: seconds of overlap between two refreshes, for rows committed
+# after the previous refresh started; days recomputed per batch.
+REPORTING_REFRESH_OVERLAP = 5 * 60
+REPORTING_DAYS_PER_BATCH = 31
+# Default and longest period served by the report endpoints.
+REPORTING_DEFAULT_DAYS = 30
+REPORTING_MAX_DAYS = 3 * 366
+
+# Streaming CSV/NDJSON exports: rows fetched per server-side cursor round
+# trip. Catalog imports are validated and upserted in batches.
+STREAMING_EXPORT_CHUNK_SIZE = 2000
+CATALOG_IMPORT_BATCH_SIZE = 1000
+
 # Swagger Configurations
 # https://drf-spectacular.readthedocs.io/en/latest/readme.html#installation
 SPECTACULAR_SETTINGS = {
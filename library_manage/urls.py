@@ -30,6 +30,7 @@ urlpatterns = [
     path("api/user/", include("users.urls", namespace="user")),
     path("api/borrowings/", include("borrowings.urls", namespace="borrowings")),
     path("api/payments/", include("payments.urls", namespace="payments")),
+    path("api/reports/", include("reporting.urls", namespace="reporting")),
 
     path('api/doc/', SpectacularAPIView.as_view(), name='schema'),
     path('api/doc/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
@@ -0,0 +1,119 @@
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, Sum, Value, When
+from django.utils import timezone
+
+from borrowings.models import Borrowing
+from library_manage.streaming import chunked
+from payments.models import Payment
+
+CENT = Decimal("0.01")
+
+
+def get_fine_days(expected_return_date, as_of):
+    """Days a fine is charged for: past the grace period, up to the cap."""
+    days = (as_of - expected_return_date).days - settings.FINE_GRACE_DAYS
+    if settings.FINE_MAX_DAYS:
+        days = min(days, settings.FINE_MAX_DAYS)
+    return max(days, 0)
+
+
+def calculate_fine(daily_fee, expected_return_date, as_of):
+    days = get_fine_days(expected_return_date, as_of)
+    fine = days * Decimal(daily_fee) * Decimal(settings.FINE_MULTIPLIER)
+    return fine.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def sync_fines(rows, as_of):
+    """
+    Bring the pending FINE payment of each borrowing in line with the
+    fine accrued by ``as_of``. ``rows`` are ``(borrowing id, expected
+    return date, daily fee)`` tuples.
+
+    Fines already paid are deducted. New fines are inserted in one
+    query, and only the pending fines whose amount changed are updated,
+    with one UPDATE ... CASE. Returns the created and updated payments.
+    """
+    accrued = {
+        borrowing_id: calculate_fine(daily_fee, expected_return_date, as_of)
+        for borrowing_id, expected_return_date, daily_fee in rows
+    }
+    fines = Payment.objects.filter(
+        borrowing_id__in=accrued, type=Payment.TypeChoices.FINE
+    )
+    paid = dict(
+        fines.filter(status=Payment.StatusChoices.PAID)
+        .values("borrowing_id")
+        .annotate(total=Sum("money_to_pay"))
+        .values_list("borrowing_id", "total")
+        .order_by()
+    )
+    pending = {
+        fine.borrowing_id: fine
+        for fine in fines.filter(status=Payment.StatusChoices.PENDING)
+    }
+
+    created, changed = [], []
+    for borrowing_id, amount in accrued.items():
+        due = amount - paid.get(borrowing_id, 0)
+        if due <= 0:
+            continue
+        fine = pending.get(borrowing_id)
+        if fine is None:
+            created.append(
+                Payment(
+                    status=Payment.StatusChoices.PENDING,
+                    type=Payment.TypeChoices.FINE,
+                    borrowing_id=borrowing_id,
+                    money_to_pay=due,
+                )
+            )
+        elif fine.money_to_pay != due:
+            fine.money_to_pay = due
+            changed.append(fine)
+
+    now = timezone.now()
+    created = Payment.objects.bulk_create(created)
+    if changed:
+        Payment.objects.filter(pk__in=[fine.pk for fine in changed]).update(
+            money_to_pay=Case(
+                *(
+                    When(pk=fine.pk, then=Value(fine.money_to_pay))
+                    for fine in changed
+                ),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+            updated_at=now,
+        )
+    if created or changed:
+        # bulk_create and queryset updates skip the signal that touches
+        # the borrowing, whose ETag must change with its fines.
+        Borrowing.objects.filter(
+            pk__in=[fine.borrowing_id for fine in created + changed]
+        ).update(updated_at=now)
+    return created + changed
+
+
+def accrue_fines(today=None):
+    """
+    Nightly pass over open overdue borrowings, so that fines are visible
+    before the book comes back. Fines already at the right amount are
+    not written.
+    """
+    today = today or timezone.localdate()
+    rows = (
+        Borrowing.objects.filter(
+            actual_return_date__isnull=True,
+            expected_return_date__lt=today
+            - timedelta(days=settings.FINE_GRACE_DAYS),
+        )
+        .exclude(checkout_status=Borrowing.CheckoutStatusChoices.FAILED)
+        .values_list("id", "expected_return_date", "book__daily_fee")
+        .iterator(chunk_size=settings.FINE_BATCH_SIZE)
+    )
+    written = 0
+    for chunk in chunked(rows, settings.FINE_BATCH_SIZE):
+        written += len(sync_fines(chunk, today))
+    return written
@@ -0,0 +1,201 @@
+import itertools
+import threading
+import time
+
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class PaymentGatewayError(Exception):
+    pass
+
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    """Network error, timeout, rate limit or 5xx: worth retrying later."""
+
+
+class CircuitOpen(PaymentGatewayUnavailable):
+    def __init__(self, retry_after):
+        super().__init__(f"Payment gateway paused for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing service for ``reset_timeout`` seconds after
+    ``threshold`` consecutive failures, then let one trial call through.
+    State is per process, like the Telegram rate limiter.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            retry_after = self.opened_at + self.reset_timeout - now
+            if retry_after > 0:
+                raise CircuitOpen(retry_after)
+            # Half open: this call is the trial, the next ones wait for it.
+            self.opened_at = now
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class PaymentGateway:
+    """
+    Base gateway: subclasses implement ``_create_checkout_session``;
+    calls go through the circuit breaker.
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            settings.PAYMENT_GATEWAY_FAILURE_THRESHOLD,
+            settings.PAYMENT_GATEWAY_RESET_TIMEOUT,
+        )
+
+    def create_checkout_session(
+        self, line_items, success_url, cancel_url, idempotency_key
+    ):
+        """
+        Create a card checkout session; the returned object has ``id``
+        and ``url``. Calls with the same ``idempotency_key`` return the
+        same session, so retries never charge twice.
+        """
+        self.breaker.before_call()
+        try:
+            session = self._create_checkout_session(
+                line_items, success_url, cancel_url, idempotency_key
+            )
+        except PaymentGatewayUnavailable:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return session
+
+    def _create_checkout_session(
+        self, line_items, success_url, cancel_url, idempotency_key
+    ):
+        raise NotImplementedError
+
+
+class StripeGateway(PaymentGateway):
+    TRANSIENT_ERRORS = (
+        stripe.error.APIConnectionError,
+        stripe.error.APIError,
+        stripe.error.RateLimitError,
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY or "",
+            http_client=stripe.RequestsClient(
+                timeout=(
+                    settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT,
+                    settings.PAYMENT_GATEWAY_READ_TIMEOUT,
+                )
+            ),
+            max_network_retries=settings.PAYMENT_GATEWAY_MAX_RETRIES,
+        )
+
+    def _create_checkout_session(
+        self, line_items, success_url, cancel_url, idempotency_key
+    ):
+        try:
+            return self.client.checkout.sessions.create(
+                params={
+                    "payment_method_types": ["card"],
+                    "line_items": line_items,
+                    "mode": "payment",
+                    "success_url": success_url,
+                    "cancel_url": cancel_url,
+                },
+                options={"idempotency_key": idempotency_key},
+            )
+        except self.TRANSIENT_ERRORS as error:
+            raise PaymentGatewayUnavailable(str(error)) from error
+        except stripe.error.StripeError as error:
+            raise PaymentGatewayError(str(error)) from error
+
+
+class FakeSession:
+    def __init__(self, session_id, url, line_items):
+        self.id = session_id
+        self.url = url
+        self.line_items = line_items
+
+
+class FakeGateway(PaymentGateway):
+    """
+    In-process gateway for tests, local runs and load tests. Sessions
+    are kept in ``sessions`` by idempotency key; queued ``errors`` are
+    raised by the next calls, and ``PAYMENT_GATEWAY_FAKE_LATENCY``
+    seconds of delay stand in for the network.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sessions = {}
+        self.errors = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _create_checkout_session(
+        self, line_items, success_url, cancel_url, idempotency_key
+    ):
+        if settings.PAYMENT_GATEWAY_FAKE_LATENCY:
+            time.sleep(settings.PAYMENT_GATEWAY_FAKE_LATENCY)
+        with self._lock:
+            if self.errors:
+                raise self.errors.pop(0)
+            if idempotency_key not in self.sessions:
+                session_id = f"cs_fake_{next(self._ids)}"
+                self.sessions[idempotency_key] = FakeSession(
+                    session_id,
+                    f"https://checkout.example.com/{session_id}",
+                    line_items,
+                )
+            return self.sessions[idempotency_key]
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = import_string(settings.PAYMENT_GATEWAY)()
+        return _gateway
+
+
+def reset_gateway():
+    global _gateway
+    with _gateway_lock:
+        _gateway = None
+
+
+@receiver(setting_changed)
+def reset_gateway_on_setting_change(*, setting, **kwargs):
+    if setting.startswith("PAYMENT_GATEWAY") or setting == "STRIPE_SECRET_KEY":
+        reset_gateway()
@@ -1,48 +1,68 @@
-import os
+import hashlib
 
-import stripe
+from django.conf import settings
 from django.urls import reverse
 
-from .models import Payment
+from payments.gateway import get_gateway
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 
+def get_checkout_urls():
+    session_query = "?session_id={CHECKOUT_SESSION_ID}"
+    success_url = (
+        f"{settings.SITE_URL}{reverse('payments:payment-success')}"
+        f"{session_query}"
+    )
+    cancel_url = (
+        f"{settings.SITE_URL}{reverse('payments:payment-cancel')}"
+        f"{session_query}"
+    )
+    return success_url, cancel_url
 
-def create_stripe_session(request, borrowing):
-    total_price = borrowing.book.daily_fee
-    unit_amount = int(total_price * 100)
 
-    success_url = request.build_absolute_uri(
-        reverse("payments:payment-success")
-    )
-    cancel_url = request.build_absolute_uri(reverse("payments:payment-cancel"))
-
-    session = stripe.checkout.Session.create(
-        payment_method_types=["card"],
-        line_items=[
-            {
-                "price_data": {
-                    "currency": "usd",
-                    "product_data": {
-                        "name": borrowing.book.title,
-                    },
-                    "unit_amount": unit_amount,
-                },
-                "quantity": 1,
-            }
+def get_line_item(name, amount):
+    return {
+        "price_data": {
+            "currency": "usd",
+            "product_data": {
+                "name": name,
+            },
+            "unit_amount": int(amount * 100),
+        },
+        "quantity": 1,
+    }
+
+
+def create_stripe_session(*borrowings):
+    """
+    Create one checkout session for the fees of the borrowings.
+    Only talks to the payment gateway, so it must be called outside of
+    transactions. Retries for the same borrowings reuse the session.
+    """
+    borrowings = sorted(borrowings, key=lambda borrowing: borrowing.id)
+    # Hashed: a bulk checkout's ids can exceed Stripe's 255 characters.
+    ids = hashlib.sha256(
+        ",".join(str(borrowing.id) for borrowing in borrowings).encode()
+    ).hexdigest()
+    return get_gateway().create_checkout_session(
+        [
+            get_line_item(borrowing.book.title, borrowing.book.daily_fee)
+            for borrowing in borrowings
         ],
-        mode="payment",
-        success_url=success_url,
-        cancel_url=cancel_url,
+        *get_checkout_urls(),
+        idempotency_key=f"borrowing-checkout-{ids}",
     )
 
-    Payment.objects.create(
-        status=Payment.StatusChoices.PENDING,
-        type=Payment.TypeChoices.PAYMENT,
-        borrowing=borrowing,
-        session_id=session.id,
-        session_url=session.url,
-        money_to_pay=total_price,
-    )
 
-    return session.id
+def create_checkout_for_payment(payment):
+    """Create a session for one payment and attach it to the payment."""
+    amount = payment.money_to_pay
+    session = get_gateway().create_checkout_session(
+        [get_line_item(f"Library {payment.get_type_display()}", amount)],
+        *get_checkout_urls(),
+        # A new amount, e.g. a fine that kept accruing, needs a new session.
+        idempotency_key=f"payment-checkout-{payment.id}-{amount}",
+    )
+    payment.session_id = session.id
+    payment.session_url = session.url
+    payment.save(update_fields=("session_id", "session_url", "updated_at"))
+    return session
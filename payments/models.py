@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.urls import reverse
 
 from borrowings.models import Borrowing
@@ -14,11 +15,18 @@ class Payment(models.Model):
         FINE = "FINE"
 
     status = models.CharField(max_length=10, choices=StatusChoices.choices)
-    type = models.CharField(max_length=10, choices=StatusChoices.choices)
-    borrowing = models.ForeignKey(Borrowing, on_delete=models.CASCADE)
+    type = models.CharField(max_length=10, choices=TypeChoices.choices)
+    borrowing = models.ForeignKey(
+        Borrowing, on_delete=models.CASCADE, related_name="payments"
+    )
     session_url = models.URLField(null=True, blank=True)
-    session_id = models.CharField(max_length=100, blank=True, null=True)
+    session_id = models.CharField(
+        max_length=100, blank=True, null=True, db_index=True
+    )
     money_to_pay = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    paid_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.get_type_display()} - {self.status}"
@@ -28,13 +36,35 @@ class Payment(models.Model):
 
     @staticmethod
     def calculate_fine(borrowing):
-        if borrowing.actual_return_date > borrowing.expected_return_date:
-            days_of_overdue = (
-                borrowing.actual_return_date - borrowing.expected_return_date
-            ).days
-            fine_multiplier = 1.1
-            daily_fee = borrowing.book.daily_fee
-            fine_amount = days_of_overdue * daily_fee * fine_multiplier
-            return fine_amount
-        else:
-            return 0
+        from payments.fines import calculate_fine
+
+        return calculate_fine(
+            borrowing.book.daily_fee,
+            borrowing.expected_return_date,
+            borrowing.actual_return_date,
+        )
+
+
+class StripeEvent(models.Model):
+    """
+    Verified Stripe webhook event, queued until a worker applies it.
+    The unique event id makes redelivered events no-ops.
+    """
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    session_id = models.CharField(max_length=255)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=Q(processed_at__isnull=True),
+                name="stripe_event_pending_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.type} ({self.event_id})"
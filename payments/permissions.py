@@ -4,5 +4,5 @@ from rest_framework import permissions
 class IsAdminOrOwnerUser(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return request.user and (
-            request.user.is_staff or obj.user == request.user
+            request.user.is_staff or obj.borrowing.user_id == request.user.id
         )
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from library_manage.streaming import ExportFilterSerializer
 from payments.models import Payment
 
 
@@ -7,3 +8,14 @@ class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = "__all__"
+
+
+class PaymentExportFilterSerializer(ExportFilterSerializer):
+    """Date range on the day the payment was created."""
+
+    status = serializers.ChoiceField(
+        choices=Payment.StatusChoices.choices, required=False
+    )
+    type = serializers.ChoiceField(
+        choices=Payment.TypeChoices.choices, required=False
+    )
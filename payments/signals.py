@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from borrowings.models import Borrowing
+from payments.models import Payment
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def touch_borrowing_on_change(sender, instance, **kwargs):
+    Borrowing.touch(instance.borrowing_id)
@@ -0,0 +1,92 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from borrowings.models import Borrowing
+from payments.fines import accrue_fines
+from payments.gateway import CircuitOpen, PaymentGatewayUnavailable
+from payments.helpers import create_checkout_for_payment
+from payments.models import Payment, StripeEvent
+
+PAID_EVENTS = (
+    "checkout.session.completed",
+    "checkout.session.async_payment_succeeded",
+)
+EXPIRED_EVENTS = (
+    "checkout.session.expired",
+    "checkout.session.async_payment_failed",
+)
+
+
+@shared_task
+def accrue_overdue_fines():
+    return accrue_fines()
+
+
+@shared_task(bind=True, max_retries=5)
+def create_payment_session(self, payment_id):
+    payment = Payment.objects.filter(
+        pk=payment_id, status=Payment.StatusChoices.PENDING
+    ).first()
+    if payment is None:
+        return None
+
+    try:
+        session = create_checkout_for_payment(payment)
+    except PaymentGatewayUnavailable as error:
+        countdown = 10 * 2**self.request.retries
+        if isinstance(error, CircuitOpen):
+            countdown = max(countdown, error.retry_after)
+        raise self.retry(exc=error, countdown=countdown)
+    return session.id
+
+
+def apply_stripe_events(events):
+    """
+    Apply a batch of events with one conditional UPDATE per outcome:
+    pending payments of paid sessions become PAID, pending payments of
+    expired sessions lose their dead checkout URL. Payments in any other
+    state are left alone, so replays and out-of-order events are safe.
+    """
+    now = timezone.now()
+    paid = {e.session_id for e in events if e.type in PAID_EVENTS}
+    expired = {e.session_id for e in events if e.type in EXPIRED_EVENTS}
+
+    pending = Payment.objects.filter(status=Payment.StatusChoices.PENDING)
+    updates = (
+        (pending.filter(session_id__in=expired), {"session_url": None}),
+        (
+            pending.filter(session_id__in=paid),
+            {"status": Payment.StatusChoices.PAID, "paid_at": now},
+        ),
+    )
+    borrowing_ids = set()
+    for payments, values in updates:
+        borrowing_ids.update(payments.values_list("borrowing_id", flat=True))
+        payments.update(**values, updated_at=now)
+
+    # Queryset updates skip the signal that touches the borrowing.
+    Borrowing.objects.filter(pk__in=borrowing_ids).update(updated_at=now)
+    StripeEvent.objects.filter(pk__in=[e.pk for e in events]).update(
+        processed_at=now
+    )
+
+
+@shared_task
+def process_stripe_events():
+    batch_size = settings.STRIPE_EVENT_BATCH_SIZE
+
+    with transaction.atomic():
+        batch = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True)
+            .order_by("id")[:batch_size]
+        )
+        if batch:
+            apply_stripe_events(batch)
+
+    if len(batch) == batch_size:
+        process_stripe_events.delay()
+
+    return len(batch)
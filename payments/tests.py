@@ -0,0 +1,393 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing
+from payments.fines import accrue_fines, calculate_fine
+from payments.gateway import (
+    CircuitOpen,
+    PaymentGatewayUnavailable,
+    get_gateway,
+    reset_gateway,
+)
+from payments.models import Payment, StripeEvent
+from payments.tasks import process_stripe_events
+
+
+class PaymentExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        admin = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=admin)
+        book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=3,
+            daily_fee=5,
+        )
+        borrowing = Borrowing.objects.create(
+            expected_return_date=(datetime.now() + timedelta(days=7)).date(),
+            book=book,
+            user=admin,
+        )
+        for payment_type in Payment.TypeChoices.values:
+            Payment.objects.create(
+                status=Payment.StatusChoices.PENDING,
+                type=payment_type,
+                borrowing=borrowing,
+                money_to_pay=5,
+            )
+        self.export_url = reverse("payments:payment-export")
+
+    def test_export_streams_ndjson_filtered_by_type(self):
+        response = self.client.get(
+            self.export_url,
+            {
+                "file_format": "ndjson",
+                "type": Payment.TypeChoices.FINE,
+                "date_from": timezone.localdate(),
+            },
+        )
+
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["type"], Payment.TypeChoices.FINE)
+        self.assertEqual(rows[0]["money_to_pay"], "5.00")
+        self.assertEqual(
+            rows[0]["borrowing__user__email"], "admin@example.com"
+        )
+
+    def test_date_range_excludes_other_days(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+
+        response = self.client.get(self.export_url, {"date_to": yesterday})
+
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 1)
+
+
+class FineAccrualTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.today = timezone.localdate()
+        book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=3,
+            daily_fee=Decimal("0.35"),
+        )
+        self.borrowing = Borrowing.objects.create(
+            expected_return_date=self.today,
+            book=book,
+            user=self.admin,
+        )
+        Borrowing.objects.filter(pk=self.borrowing.pk).update(
+            borrow_date=self.today - timedelta(days=10),
+            expected_return_date=self.today - timedelta(days=3),
+        )
+
+    def get_fines(self):
+        return Payment.objects.filter(
+            borrowing=self.borrowing, type=Payment.TypeChoices.FINE
+        )
+
+    def test_calculate_fine_is_exact(self):
+        self.assertEqual(
+            calculate_fine(
+                Decimal("0.35"), self.today - timedelta(days=3), self.today
+            ),
+            Decimal("1.16"),
+        )
+
+    @override_settings(FINE_GRACE_DAYS=1, FINE_MAX_DAYS=5)
+    def test_policy_grace_days_and_cap(self):
+        expected = self.today - timedelta(days=30)
+        self.assertEqual(
+            calculate_fine(Decimal("1"), self.today, self.today), 0
+        )
+        self.assertEqual(
+            calculate_fine(Decimal("1"), expected, self.today),
+            Decimal("5.50"),
+        )
+
+    def test_accrual_only_writes_changed_fines(self):
+        self.assertEqual(accrue_fines(self.today), 1)
+        self.assertEqual(accrue_fines(self.today), 0)
+        self.assertEqual(accrue_fines(self.today + timedelta(days=1)), 1)
+
+        fine = self.get_fines().get()
+        self.assertEqual(fine.status, Payment.StatusChoices.PENDING)
+        self.assertEqual(fine.money_to_pay, Decimal("1.54"))
+
+    def test_first_fine_touches_the_borrowing(self):
+        updated_at = Borrowing.objects.get(pk=self.borrowing.pk).updated_at
+
+        accrue_fines(self.today)
+
+        self.assertGreater(
+            Borrowing.objects.get(pk=self.borrowing.pk).updated_at,
+            updated_at,
+        )
+
+    def test_accrual_deducts_paid_fines(self):
+        Payment.objects.create(
+            status=Payment.StatusChoices.PAID,
+            type=Payment.TypeChoices.FINE,
+            borrowing=self.borrowing,
+            money_to_pay=Decimal("1.00"),
+        )
+
+        accrue_fines(self.today)
+
+        pending = self.get_fines().get(status=Payment.StatusChoices.PENDING)
+        self.assertEqual(pending.money_to_pay, Decimal("0.16"))
+
+    def test_return_updates_accrued_fine(self):
+        accrue_fines(self.today - timedelta(days=1))
+
+        response = self.client.put(
+            reverse(
+                "borrowings:borrowing-return", args=[self.borrowing.id]
+            )
+        )
+
+        self.assertEqual(response.status_code, 200)
+        fine = self.get_fines().get()
+        self.assertEqual(fine.money_to_pay, Decimal("1.16"))
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET="whsec_test")
+class StripeWebhookTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=3,
+            daily_fee=5,
+        )
+        self.borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.localdate() + timedelta(days=7),
+            book=book,
+            user=user,
+        )
+        self.payment = Payment.objects.create(
+            status=Payment.StatusChoices.PENDING,
+            type=Payment.TypeChoices.PAYMENT,
+            borrowing=self.borrowing,
+            session_id="cs_test_1",
+            session_url="https://checkout.stripe.com/cs_test_1",
+            money_to_pay=5,
+        )
+        self.url = reverse("payments:stripe-webhook")
+
+    def post_event(self, event_id, event_type, secret="whsec_test"):
+        payload = json.dumps(
+            {
+                "id": event_id,
+                "object": "event",
+                "type": event_type,
+                "data": {
+                    "object": {
+                        "id": "cs_test_1",
+                        "object": "checkout.session",
+                        "payment_status": "paid",
+                    }
+                },
+            }
+        )
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode(),
+            f"{timestamp}.{payload}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        return self.client.post(
+            self.url,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+        )
+
+    def test_event_is_queued_once_and_marks_payment_paid(self):
+        for _ in range(2):
+            response = self.post_event(
+                "evt_1", "checkout.session.completed"
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+
+        self.assertEqual(process_stripe_events(), 1)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PAID)
+        self.assertIsNotNone(self.payment.paid_at)
+        self.assertFalse(
+            StripeEvent.objects.filter(processed_at__isnull=True).exists()
+        )
+        self.assertEqual(process_stripe_events(), 0)
+
+    def test_expired_session_drops_checkout_url(self):
+        self.post_event("evt_2", "checkout.session.expired")
+
+        process_stripe_events()
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+        self.assertIsNone(self.payment.session_url)
+
+    def test_invalid_signature_is_rejected(self):
+        response = self.post_event(
+            "evt_3", "checkout.session.completed", secret="whsec_other"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_success_page_does_not_write(self):
+        response = self.client.get(
+            reverse("payments:payment-success"), {"session_id": "cs_test_1"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "PENDING")
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.StatusChoices.PENDING)
+
+
+@override_settings(
+    PAYMENT_GATEWAY="payments.gateway.FakeGateway",
+    PAYMENT_GATEWAY_FAILURE_THRESHOLD=2,
+)
+class PaymentGatewayTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=user)
+        book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=3,
+            daily_fee=5,
+        )
+        borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.localdate() + timedelta(days=7),
+            book=book,
+            user=user,
+        )
+        self.payment = Payment.objects.create(
+            status=Payment.StatusChoices.PENDING,
+            type=Payment.TypeChoices.FINE,
+            borrowing=borrowing,
+            money_to_pay=Decimal("12.50"),
+        )
+        self.url = reverse("payments:create-checkout-session")
+        reset_gateway()
+        self.gateway = get_gateway()
+
+    def test_session_is_created_once_per_payment_amount(self):
+        for _ in range(2):
+            response = self.client.post(
+                self.url, {"payment_id": self.payment.id}
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(self.gateway.sessions), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.session_id, response.data["id"])
+        [session] = self.gateway.sessions.values()
+        self.assertEqual(
+            session.line_items[0]["price_data"]["unit_amount"], 1250
+        )
+
+    def test_retried_checkout_is_replayed_without_calling_gateway(self):
+        cache.clear()
+        with mock.patch.object(
+            self.gateway,
+            "create_checkout_session",
+            wraps=self.gateway.create_checkout_session,
+        ) as create_checkout_session:
+            first, replay = (
+                self.client.post(
+                    self.url,
+                    {"payment_id": self.payment.id},
+                    HTTP_IDEMPOTENCY_KEY="checkout-1",
+                )
+                for _ in range(2)
+            )
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        create_checkout_session.assert_called_once()
+
+    def test_paid_payment_is_not_checked_out_again(self):
+        Payment.objects.filter(pk=self.payment.pk).update(
+            status=Payment.StatusChoices.PAID
+        )
+
+        response = self.client.post(self.url, {"payment_id": self.payment.id})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.gateway.sessions, {})
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.gateway.errors = [
+            PaymentGatewayUnavailable("timeout"),
+            PaymentGatewayUnavailable("timeout"),
+        ]
+        for _ in range(2):
+            response = self.client.post(
+                self.url, {"payment_id": self.payment.id}
+            )
+            self.assertEqual(response.status_code, 503)
+
+        response = self.client.post(self.url, {"payment_id": self.payment.id})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+        self.assertEqual(self.gateway.sessions, {})
+        with self.assertRaises(CircuitOpen):
+            self.gateway.create_checkout_session([], "", "", "key")
+
+    @override_settings(PAYMENT_GATEWAY_ASYNC=True)
+    @mock.patch("payments.views.create_payment_session.delay")
+    def test_async_mode_leaves_the_call_to_a_worker(self, delay):
+        response = self.client.post(self.url, {"payment_id": self.payment.id})
+
+        self.assertEqual(response.status_code, 202)
+        delay.assert_called_once_with(self.payment.id)
+        self.payment.refresh_from_db()
+        self.assertIsNone(self.payment.session_id)
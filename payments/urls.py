@@ -3,14 +3,17 @@ from django.urls import path
 from .views import (
     PaymentListAPIView,
     PaymentDetailAPIView,
+    PaymentExportView,
     CreateCheckoutSessionView,
     StripePaymentSuccessAPIView,
     StripePaymentCancelAPIView,
+    StripeWebhookAPIView,
 )
 
 urlpatterns = [
     path("", PaymentListAPIView.as_view(), name="payment-list"),
     path("<int:pk>/", PaymentDetailAPIView.as_view(), name="payment-detail"),
+    path("export/", PaymentExportView.as_view(), name="payment-export"),
     path(
         "create-checkout-session/",
         CreateCheckoutSessionView.as_view(),
@@ -26,6 +29,11 @@ urlpatterns = [
         StripePaymentCancelAPIView.as_view(),
         name="payment-cancel"
     ),
+    path(
+        "webhook/",
+        StripeWebhookAPIView.as_view(),
+        name="stripe-webhook",
+    ),
 ]
 
 app_name = "payments"
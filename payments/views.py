@@ -1,139 +1,235 @@
-import os
-
-from dotenv import load_dotenv
+from datetime import datetime, time, timedelta
 
 import stripe
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from library_manage.conditional import ConditionalGetMixin
+from library_manage.db_routers import ReplicaReadMixin
+from library_manage.idempotency import IdempotentPostMixin
+from library_manage.streaming import ExportAPIView
+from payments.gateway import (
+    CircuitOpen,
+    PaymentGatewayError,
+    PaymentGatewayUnavailable,
+)
+from payments.helpers import create_checkout_for_payment
 from payments.models import Payment
+from payments.pagination import PaymentPagination
 from payments.permissions import IsAdminOrOwnerUser
-from payments.serializers import PaymentSerializer
+from payments.serializers import (
+    PaymentExportFilterSerializer,
+    PaymentSerializer,
+)
+from payments.tasks import create_payment_session
+from payments.webhooks import enqueue_stripe_event
+
 
-load_dotenv()
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
 
 
-class PaymentListAPIView(generics.ListCreateAPIView):
+class PaymentListAPIView(
+    ReplicaReadMixin, ConditionalGetMixin, generics.ListCreateAPIView
+):
     serializer_class = PaymentSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = PaymentPagination
 
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
             return Payment.objects.all()
         else:
-            return Payment.objects.filter(user=user)
+            return Payment.objects.filter(borrowing__user=user)
 
 
-class PaymentDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class PaymentExportView(ReplicaReadMixin, ExportAPIView):
     queryset = Payment.objects.all()
+    filter_serializer_class = PaymentExportFilterSerializer
+    filename = "payments"
+    export_fields = (
+        "id",
+        "created_at",
+        "status",
+        "type",
+        "money_to_pay",
+        "borrowing_id",
+        "borrowing__user__email",
+        "session_id",
+    )
+
+    def filter_export_queryset(self, queryset, filters):
+        # Compare against day boundaries so the created_at index is used.
+        if "date_from" in filters:
+            queryset = queryset.filter(
+                created_at__gte=start_of_day(filters["date_from"])
+            )
+        if "date_to" in filters:
+            queryset = queryset.filter(
+                created_at__lt=start_of_day(
+                    filters["date_to"] + timedelta(days=1)
+                )
+            )
+        if "status" in filters:
+            queryset = queryset.filter(status=filters["status"])
+        if "type" in filters:
+            queryset = queryset.filter(type=filters["type"])
+        return queryset
+
+
+class PaymentDetailAPIView(
+    ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView
+):
+    queryset = Payment.objects.select_related("borrowing")
     serializer_class = PaymentSerializer
     permission_classes = (IsAdminOrOwnerUser,)
 
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+class CreateCheckoutSessionView(IdempotentPostMixin, APIView):
+    """
+    Create a checkout session for a payment. With PAYMENT_GATEWAY_ASYNC
+    the call to the gateway is left to a worker and the session shows up
+    on the payment once it exists; otherwise it is made here, within the
+    gateway's timeouts.
+    """
 
-
-class CreateCheckoutSessionView(APIView):
-    def post(self, request, *args, **kwargs):
+    def create(self, request, *args, **kwargs):
         payment_id = request.data.get("payment_id")
         payment = get_object_or_404(Payment, id=payment_id)
+        if payment.status != Payment.StatusChoices.PENDING:
+            return Response(
+                {"error": "Only pending payments can be checked out"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "usd",
-                        "product_data": {
-                            "name": "Library Payment",
-                        },
-                        "unit_amount": int(payment.money_to_pay * 100),
-                    },
-                    "quantity": 1,
-                }
-            ],
-            mode="payment",
-            success_url="http://localhost:8000/payments/success/",
-            cancel_url="http://localhost:8000/payments/cancel/",
-        )
-
-        payment.session_id = session.id
-        payment.session_url = session.url
-        payment.save()
-
-        return Response({"id": session.id}, status=status.HTTP_200_OK)
-
-
-class StripePaymentSuccessAPIView(APIView):
-    def get(self, request):
-        session_id = request.GET.get("session_id")
-        if not session_id:
+        if settings.PAYMENT_GATEWAY_ASYNC:
+            create_payment_session.delay(payment.id)
             return Response(
-                {"error": "Session ID not provided"},
-                status=status.HTTP_400_BAD_REQUEST
+                {"payment": payment.id}, status=status.HTTP_202_ACCEPTED
             )
 
         try:
-            payment = Payment.objects.get(session_id=session_id)
-        except Payment.DoesNotExist:
+            session = create_checkout_for_payment(payment)
+        except PaymentGatewayUnavailable as error:
+            headers = {}
+            if isinstance(error, CircuitOpen):
+                headers["Retry-After"] = str(int(error.retry_after) + 1)
             return Response(
-                {"error": "Payment not found for session ID"},
-                status=status.HTTP_404_NOT_FOUND
+                {"error": str(error)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers=headers,
             )
-
-        borrowing = payment.borrowing
-        if payment.status == Payment.StatusChoices.PAID:
+        except PaymentGatewayError as error:
             return Response(
-                {
-                    "message": "Payment already marked as paid",
-                    "borrowing": borrowing.id
-                },
-                status=status.HTTP_200_OK,
+                {"error": str(error)}, status=status.HTTP_502_BAD_GATEWAY
             )
 
-        payment.status = Payment.StatusChoices.PAID
-        payment.save()
+        return Response({"id": session.id}, status=status.HTTP_200_OK)
+
+
+def get_session_payment(request):
+    session_id = request.GET.get("session_id")
+    if not session_id:
+        return None, Response(
+            {"error": "Session ID not provided"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    payment = (
+        Payment.objects.filter(session_id=session_id)
+        .only("status", "borrowing_id")
+        .first()
+    )
+    if payment is None:
+        return None, Response(
+            {"error": "Payment not found for session ID"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    return payment, None
 
+
+class StripePaymentSuccessAPIView(APIView):
+    """
+    Landing page of a completed checkout. Read only: the payment is
+    marked as paid by the Stripe webhook, possibly a moment later.
+    """
+
+    def get(self, request):
+        payment, error = get_session_payment(request)
+        if error:
+            return error
+
+        if payment.status == Payment.StatusChoices.PAID:
+            message = "Payment successful"
+        else:
+            message = "Payment is being processed"
         return Response(
-            {"message": "Payment successful", "borrowing": borrowing.id},
+            {
+                "message": message,
+                "status": payment.status,
+                "borrowing": payment.borrowing_id,
+            },
             status=status.HTTP_200_OK,
         )
 
 
 class StripePaymentCancelAPIView(APIView):
-    def get(self, request):
-        session_id = request.GET.get("session_id")
-        if not session_id:
-            return Response(
-                {"error": "Session ID not provided"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    """Landing page of an abandoned checkout. Read only."""
 
-        try:
-            payment = Payment.objects.get(session_id=session_id)
-        except Payment.DoesNotExist:
-            return Response(
-                {"error": "Payment not found for session ID"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+    def get(self, request):
+        payment, error = get_session_payment(request)
+        if error:
+            return error
 
-        borrowing = payment.borrowing
         if payment.status == Payment.StatusChoices.PAID:
             return Response(
                 {
                     "error": "Cannot cancel a paid payment",
-                    "borrowing": borrowing.id
+                    "borrowing": payment.borrowing_id,
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        payment.status = Payment.StatusChoices.PENDING
-        payment.save()
-
         return Response(
-            {"message": "Payment cancelled", "borrowing": borrowing.id},
+            {
+                "message": "Payment cancelled",
+                "borrowing": payment.borrowing_id,
+            },
             status=status.HTTP_200_OK,
         )
+
+
+class StripeWebhookAPIView(APIView):
+    """
+    Verify a Stripe event and queue it; workers apply queued events in
+    batches, so the acknowledgement costs one INSERT.
+    """
+
+    authentication_classes = ()
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request):
+        if not settings.STRIPE_WEBHOOK_SECRET:
+            return Response(
+                {"error": "Stripe webhooks are not configured"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        try:
+            event = stripe.Webhook.construct_event(
+                request.body,
+                request.META.get("HTTP_STRIPE_SIGNATURE", ""),
+                settings.STRIPE_WEBHOOK_SECRET,
+            )
+        except (ValueError, stripe.error.SignatureVerificationError):
+            return Response(
+                {"error": "Invalid Stripe event"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        enqueue_stripe_event(event)
+        return Response({"received": True}, status=status.HTTP_200_OK)
@@ -0,0 +1,35 @@
+from django.db import transaction
+
+from payments.models import StripeEvent
+from payments.tasks import EXPIRED_EVENTS, PAID_EVENTS, process_stripe_events
+
+
+def enqueue_stripe_event(event):
+    """
+    Queue a verified Stripe event for the workers; one INSERT that is
+    ignored for an event id already seen. Events that do not change a
+    payment are dropped. Returns whether the event is relevant.
+    """
+    session = event["data"]["object"]
+    if event["type"] not in PAID_EVENTS + EXPIRED_EVENTS:
+        return False
+    # Delayed payment methods complete before the money arrives; the
+    # async_payment_succeeded event follows.
+    if (
+        event["type"] == "checkout.session.completed"
+        and session.get("payment_status") != "paid"
+    ):
+        return False
+
+    StripeEvent.objects.bulk_create(
+        [
+            StripeEvent(
+                event_id=event["id"],
+                type=event["type"],
+                session_id=session["id"],
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(process_stripe_events.delay, robust=True)
+    return True
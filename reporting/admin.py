@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+from reporting.models import DailyBookLoans, DailyReport, ReportWatermark
+
+admin.site.register(DailyReport)
+admin.site.register(DailyBookLoans)
+admin.site.register(ReportWatermark)
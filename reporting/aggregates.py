@@ -0,0 +1,176 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from borrowings.models import Borrowing
+from library_manage.streaming import chunked
+from payments.models import Payment
+from reporting.models import DailyBookLoans, DailyReport, ReportWatermark
+
+WATERMARK = "daily"
+REPORT_FIELDS = (
+    "loans",
+    "returns",
+    "late_returns",
+    "revenue",
+    "fines_issued",
+)
+
+
+def _loans():
+    return Borrowing.objects.exclude(
+        checkout_status=Borrowing.CheckoutStatusChoices.FAILED
+    )
+
+
+def _day_bounds(days):
+    start = timezone.make_aware(datetime.combine(min(days), time.min))
+    end = timezone.make_aware(
+        datetime.combine(max(days) + timedelta(days=1), time.min)
+    )
+    return start, end
+
+
+def _payment_days(queryset, field):
+    return (
+        queryset.annotate(day=TruncDate(field))
+        .exclude(day__isnull=True)
+        .values_list("day", flat=True)
+        .distinct()
+    )
+
+
+def get_touched_days(since):
+    """
+    Local days whose figures may have changed since ``since``, found
+    through the indexed updated_at columns. ``None`` means every day.
+    """
+    borrowings = Borrowing.objects.all()
+    payments = Payment.objects.all()
+    if since is not None:
+        borrowings = borrowings.filter(updated_at__gte=since)
+        payments = payments.filter(updated_at__gte=since)
+
+    days = set(
+        borrowings.values_list("borrow_date", flat=True).distinct()
+    )
+    days.update(
+        borrowings.filter(actual_return_date__isnull=False)
+        .values_list("actual_return_date", flat=True)
+        .distinct()
+    )
+    days.update(_payment_days(payments, "created_at"))
+    days.update(_payment_days(payments, "paid_at"))
+    return days
+
+
+def _grouped(queryset, day_field, **aggregates):
+    return {
+        row.pop("day"): row
+        for row in queryset.annotate(day=day_field)
+        .values("day")
+        .annotate(**aggregates)
+        .order_by()
+    }
+
+
+def rebuild_days(days):
+    """Recompute the reports of ``days`` from the source tables."""
+    start, end = _day_bounds(days)
+
+    loans = _grouped(
+        _loans().filter(borrow_date__in=days),
+        F("borrow_date"),
+        loans=Count("id"),
+    )
+    returns = _grouped(
+        _loans().filter(actual_return_date__in=days),
+        F("actual_return_date"),
+        returns=Count("id"),
+        late_returns=Count(
+            "id",
+            filter=Q(actual_return_date__gt=F("expected_return_date")),
+        ),
+    )
+    revenue = _grouped(
+        Payment.objects.filter(
+            status=Payment.StatusChoices.PAID,
+            paid_at__gte=start,
+            paid_at__lt=end,
+        ),
+        TruncDate("paid_at"),
+        revenue=Sum("money_to_pay"),
+    )
+    fines = _grouped(
+        Payment.objects.filter(
+            type=Payment.TypeChoices.FINE,
+            created_at__gte=start,
+            created_at__lt=end,
+        ),
+        TruncDate("created_at"),
+        fines_issued=Sum("money_to_pay"),
+    )
+
+    reports = []
+    for day in days:
+        values = {field: 0 for field in REPORT_FIELDS}
+        for source in (loans, returns, revenue, fines):
+            values.update(source.get(day, {}))
+        reports.append(DailyReport(day=day, **values))
+
+    book_loans = [
+        DailyBookLoans(**row)
+        for row in _loans()
+        .filter(borrow_date__in=days)
+        .values("book_id", day=F("borrow_date"))
+        .annotate(loans=Count("id"))
+        .order_by()
+    ]
+
+    with transaction.atomic():
+        DailyReport.objects.bulk_create(
+            reports,
+            update_conflicts=True,
+            unique_fields=("day",),
+            update_fields=(*REPORT_FIELDS, "refreshed_at"),
+        )
+        DailyBookLoans.objects.filter(day__in=days).delete()
+        DailyBookLoans.objects.bulk_create(book_loans)
+
+
+def snapshot_outstanding_fines(day):
+    outstanding = Payment.objects.filter(
+        type=Payment.TypeChoices.FINE, status=Payment.StatusChoices.PENDING
+    ).aggregate(total=Sum("money_to_pay"))["total"]
+    DailyReport.objects.update_or_create(
+        day=day, defaults={"outstanding_fines": outstanding or 0}
+    )
+
+
+def refresh_reports(now=None):
+    """
+    Fold everything changed since the last run into the daily reports.
+
+    Only the days touched by rows updated since the watermark are
+    recomputed. The watermark is moved back by
+    REPORTING_REFRESH_OVERLAP so that rows committed late by a concurrent
+    transaction are still picked up on the next run.
+    """
+    now = now or timezone.now()
+    watermark, _ = ReportWatermark.objects.get_or_create(name=WATERMARK)
+    since = watermark.refreshed_until
+    if since is not None:
+        since -= timedelta(seconds=settings.REPORTING_REFRESH_OVERLAP)
+
+    days = sorted(get_touched_days(since))
+    for chunk in chunked(days, settings.REPORTING_DAYS_PER_BATCH):
+        rebuild_days(chunk)
+    snapshot_outstanding_fines(timezone.localdate(now))
+
+    watermark.refreshed_until = now
+    watermark.save(update_fields=("refreshed_until",))
+    return len(days)
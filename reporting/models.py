@@ -0,0 +1,52 @@
+from django.db import models
+
+from books.models import Book
+
+
+class DailyReport(models.Model):
+    """Library activity of one local calendar day."""
+
+    day = models.DateField(primary_key=True)
+    loans = models.IntegerField(default=0)
+    returns = models.IntegerField(default=0)
+    late_returns = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    fines_issued = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0
+    )
+    # Unpaid fines as of the last refresh made on that day.
+    outstanding_fines = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True
+    )
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Report of {self.day}"
+
+
+class DailyBookLoans(models.Model):
+    day = models.DateField()
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name="daily_loans"
+    )
+    loans = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "book"], name="daily_book_loans_unique"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} on {self.day}: {self.loans}"
+
+
+class ReportWatermark(models.Model):
+    """How far the source tables have been folded into the reports."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    refreshed_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.refreshed_until}"
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+
+BUCKETS = ("day", "week", "month")
+
+
+class ReportFilterSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        date_to = attrs.get("date_to") or timezone.localdate()
+        date_from = attrs.get("date_from") or date_to - timedelta(
+            days=settings.REPORTING_DEFAULT_DAYS - 1
+        )
+        if date_from > date_to:
+            raise serializers.ValidationError(
+                "date_from must not be after date_to."
+            )
+        if (date_to - date_from).days >= settings.REPORTING_MAX_DAYS:
+            raise serializers.ValidationError(
+                f"Reports cover at most {settings.REPORTING_MAX_DAYS} days."
+            )
+        attrs["date_from"], attrs["date_to"] = date_from, date_to
+        return attrs
+
+
+class DailyReportFilterSerializer(ReportFilterSerializer):
+    bucket = serializers.ChoiceField(choices=BUCKETS, default="day")
+
+
+class TopBooksFilterSerializer(ReportFilterSerializer):
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class ReportBucketSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    loans = serializers.IntegerField()
+    returns = serializers.IntegerField()
+    late_returns = serializers.IntegerField()
+    overdue_rate = serializers.FloatField(allow_null=True)
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    fines_issued = serializers.DecimalField(max_digits=12, decimal_places=2)
+    outstanding_fines = serializers.DecimalField(
+        max_digits=12, decimal_places=2, allow_null=True
+    )
+
+
+class TopBookSerializer(serializers.Serializer):
+    book = serializers.IntegerField(source="book_id")
+    title = serializers.CharField(source="book__title")
+    author = serializers.CharField(source="book__author")
+    loans = serializers.IntegerField()
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from reporting import aggregates
+
+
+@shared_task
+def refresh_reports():
+    return aggregates.refresh_reports()
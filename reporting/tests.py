@@ -0,0 +1,158 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing
+from payments.models import Payment
+from reporting.aggregates import refresh_reports
+from reporting.models import DailyBookLoans, DailyReport
+from reporting.views import bucket_reports
+
+
+class ReportingTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.today = timezone.localdate()
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=5,
+        )
+        self.other_book = Book.objects.create(
+            title="Other Book",
+            author="Other Author",
+            cover="SOFT",
+            inventory=5,
+            daily_fee=2,
+        )
+
+    def borrow(self, book, expected_return_date=None):
+        return Borrowing.objects.create(
+            expected_return_date=(
+                expected_return_date or self.today + timedelta(days=7)
+            ),
+            book=book,
+            user=self.admin,
+        )
+
+    def test_refresh_folds_activity_into_daily_report(self):
+        late = self.borrow(self.book)
+        self.borrow(self.book)
+        self.borrow(self.other_book)
+        late.expected_return_date = self.today
+        late.actual_return_date = self.today + timedelta(days=1)
+        late.save()
+        Payment.objects.create(
+            status=Payment.StatusChoices.PAID,
+            type=Payment.TypeChoices.PAYMENT,
+            borrowing=late,
+            money_to_pay=Decimal("10.00"),
+            paid_at=timezone.now(),
+        )
+        Payment.objects.create(
+            status=Payment.StatusChoices.PENDING,
+            type=Payment.TypeChoices.FINE,
+            borrowing=late,
+            money_to_pay=Decimal("2.50"),
+        )
+
+        refresh_reports()
+
+        returned = DailyReport.objects.get(day=late.actual_return_date)
+        self.assertEqual(returned.returns, 1)
+        self.assertEqual(returned.late_returns, 1)
+        report = DailyReport.objects.get(day=self.today)
+        self.assertEqual(report.loans, 3)
+        self.assertEqual(report.revenue, Decimal("10.00"))
+        self.assertEqual(report.fines_issued, Decimal("2.50"))
+        self.assertEqual(report.outstanding_fines, Decimal("2.50"))
+        self.assertEqual(
+            DailyBookLoans.objects.get(day=self.today, book=self.book).loans,
+            2,
+        )
+
+    def test_refresh_only_recomputes_touched_days(self):
+        self.borrow(self.book)
+        refresh_reports()
+        old_day = self.today - timedelta(days=40)
+        DailyReport.objects.create(day=old_day, loans=7)
+
+        self.borrow(self.other_book)
+        refresh_reports()
+
+        self.assertEqual(DailyReport.objects.get(day=self.today).loans, 2)
+        self.assertEqual(DailyReport.objects.get(day=old_day).loans, 7)
+
+    def test_bucket_reports_by_month(self):
+        first = self.today.replace(day=1)
+        reports = [
+            DailyReport(
+                day=first,
+                loans=2,
+                returns=2,
+                late_returns=1,
+                outstanding_fines=Decimal("3"),
+            ),
+            DailyReport(
+                day=first + timedelta(days=1),
+                loans=1,
+                returns=2,
+                outstanding_fines=Decimal("1"),
+            ),
+        ]
+
+        [bucket] = bucket_reports(reports, "month")
+
+        self.assertEqual(bucket["period"], first)
+        self.assertEqual(bucket["loans"], 3)
+        self.assertEqual(bucket["overdue_rate"], 0.25)
+        self.assertEqual(bucket["outstanding_fines"], Decimal("1"))
+
+    def test_daily_and_top_books_endpoints(self):
+        self.borrow(self.book)
+        self.borrow(self.book)
+        self.borrow(self.other_book)
+        refresh_reports()
+
+        response = self.client.get(reverse("reporting:report-daily"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[-1]["loans"], 3)
+        self.assertIsNone(response.data[-1]["overdue_rate"])
+
+        response = self.client.get(
+            reverse("reporting:report-top-books"), {"limit": 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "book": self.book.id,
+                    "title": "Test Book",
+                    "author": "Test Author",
+                    "loans": 2,
+                }
+            ],
+        )
+
+    def test_reports_are_admin_only(self):
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get(reverse("reporting:report-daily"))
+
+        self.assertEqual(response.status_code, 403)
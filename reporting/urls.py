@@ -0,0 +1,9 @@
+from django.urls import path
+
+from reporting.views import DailyReportView, TopBooksView
+
+urlpatterns = [
+    path("daily/", DailyReportView.as_view(), name="report-daily"),
+    path("top-books/", TopBooksView.as_view(), name="report-top-books"),
+]
+app_name = "reporting"
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.db.models import Sum
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from library_manage.db_routers import ReplicaReadMixin
+from reporting.aggregates import REPORT_FIELDS
+from reporting.models import DailyBookLoans, DailyReport
+from reporting.serializers import (
+    DailyReportFilterSerializer,
+    ReportBucketSerializer,
+    TopBookSerializer,
+    TopBooksFilterSerializer,
+)
+from users.authentication import CachedJWTAuthentication
+
+
+def get_period(day, bucket):
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def bucket_reports(reports, bucket):
+    """
+    Sum ``DailyReport`` rows (ordered by day) into day, week or month
+    buckets. Outstanding fines are a balance, so a bucket keeps the last
+    known value instead of a sum.
+    """
+    buckets = {}
+    for report in reports:
+        period = get_period(report.day, bucket)
+        row = buckets.setdefault(
+            period,
+            {
+                "period": period,
+                "outstanding_fines": None,
+                **{field: 0 for field in REPORT_FIELDS},
+            },
+        )
+        for field in REPORT_FIELDS:
+            row[field] += getattr(report, field)
+        if report.outstanding_fines is not None:
+            row["outstanding_fines"] = report.outstanding_fines
+
+    for row in buckets.values():
+        row["overdue_rate"] = (
+            round(row["late_returns"] / row["returns"], 4)
+            if row["returns"]
+            else None
+        )
+    return list(buckets.values())
+
+
+class ReportAPIView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Admin reports read from the aggregate tables kept by the
+    ``refresh_reports`` task, so their cost depends on the length of the
+    period and not on the number of borrowings or payments.
+    """
+
+    # Not the stateless mode: a demoted admin must lose access at once.
+    authentication_classes = (CachedJWTAuthentication,)
+    permission_classes = (IsAdminUser,)
+    pagination_class = None
+
+    def get_filters(self, request):
+        serializer = self.filter_serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+
+class DailyReportView(ReportAPIView):
+    queryset = DailyReport.objects.all()
+    serializer_class = ReportBucketSerializer
+    filter_serializer_class = DailyReportFilterSerializer
+
+    @extend_schema(parameters=[DailyReportFilterSerializer])
+    def get(self, request, *args, **kwargs):
+        filters = self.get_filters(request)
+        reports = self.get_queryset().filter(
+            day__range=(filters["date_from"], filters["date_to"])
+        ).order_by("day")
+        serializer = self.get_serializer(
+            bucket_reports(reports, filters["bucket"]), many=True
+        )
+        return Response(serializer.data)
+
+
+class TopBooksView(ReportAPIView):
+    queryset = DailyBookLoans.objects.all()
+    serializer_class = TopBookSerializer
+    filter_serializer_class = TopBooksFilterSerializer
+
+    @extend_schema(parameters=[TopBooksFilterSerializer])
+    def get(self, request, *args, **kwargs):
+        filters = self.get_filters(request)
+        books = (
+            self.get_queryset()
+            .filter(day__range=(filters["date_from"], filters["date_to"]))
+            .values("book_id", "book__title", "book__author")
+            .annotate(loans=Sum("loans"))
+            .order_by("-loans", "book_id")[: filters["limit"]]
+        )
+        serializer = self.get_serializer(books, many=True)
+        return Response(serializer.data)
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+USER_CACHE_KEY = "users:auth:{}"
+TOKEN_VERSION_CLAIM = "token_version"
+
+
+def check_token_version(user, validated_token):
+    if validated_token.get(TOKEN_VERSION_CLAIM, 0) != user.token_version:
+        raise AuthenticationFailed(
+            _("Token has been revoked."), code="token_revoked"
+        )
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that keeps resolved users in the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds instead of loading the row on every
+    request. Saving or deleting a user drops the entry, and tokens issued
+    before the user's ``token_version`` changed (e.g. a new password)
+    are rejected.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+
+        key = USER_CACHE_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        elif not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+
+        check_token_version(user, validated_token)
+        return user
+
+
+class StatelessReadJWTAuthentication(CachedJWTAuthentication):
+    """
+    For read-only views that only need the id and staff flag: safe
+    requests get a ``TokenUser`` built from the token claims, without
+    any lookup. Such a user is not checked for deactivation or revoked
+    tokens until the access token expires; refreshing it checks the user
+    again (see ``users.serializers.TokenRefreshSerializer``). Keep it off
+    staff-only views, which would trust a stale ``is_staff`` claim.
+    """
+
+    def authenticate(self, request):
+        self.stateless = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not self.stateless:
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+        return api_settings.TOKEN_USER_CLASS(validated_token)
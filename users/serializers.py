@@ -1,5 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.utils.translation import gettext as _
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer as BaseTokenObtainPairSerializer,
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from users.authentication import TOKEN_VERSION_CLAIM, check_token_version
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -21,3 +30,46 @@ class UserSerializer(serializers.ModelSerializer):
             user.save()
 
         return user
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    """Carry the claims the authentication classes check or rely on."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        token["is_staff"] = user.is_staff
+        return token
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    Check the user behind a refresh token before minting an access token
+    from it: the claims it copies are trusted without a lookup by the
+    stateless read views.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = (
+            get_user_model()
+            .objects.filter(
+                **{
+                    api_settings.USER_ID_FIELD: refresh.get(
+                        api_settings.USER_ID_CLAIM
+                    )
+                }
+            )
+            .first()
+        )
+        if user is None or not user.is_active:
+            raise AuthenticationFailed(
+                _("User not found or inactive"), code="user_inactive"
+            )
+        check_token_version(user, refresh)
+        if refresh.get("is_staff", user.is_staff) != user.is_staff:
+            raise AuthenticationFailed(
+                _("Token has been revoked."), code="token_revoked"
+            )
+        return super().validate(attrs)
@@ -0,0 +1,16 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.authentication import USER_CACHE_KEY
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    key = USER_CACHE_KEY.format(instance.pk)
+    cache.delete(key)
+    # Again after commit, in case a request cached the old row meanwhile.
+    transaction.on_commit(lambda: cache.delete(key), robust=True)
@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123"
+        )
+        self.me_url = reverse("user:manage")
+
+    def get_access_token(self, password="password123"):
+        return self.get_tokens(password)["access"]
+
+    def get_tokens(self, password="password123"):
+        response = self.client.post(
+            reverse("user:token_obtain_pair"),
+            {"email": "user@example.com", "password": password},
+        )
+        return response.data
+
+    def refresh(self, refresh_token):
+        return self.client.post(
+            reverse("user:token_refresh"), {"refresh": refresh_token}
+        )
+
+    def get_me(self, token):
+        return self.client.get(
+            self.me_url, HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+    def test_user_is_loaded_once(self):
+        token = self.get_access_token()
+        self.assertEqual(self.get_me(token).status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_me(token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        token = self.get_access_token()
+        self.get_me(token)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.get_me(token)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_issued_tokens(self):
+        token = self.get_access_token()
+        response = self.client.patch(
+            self.me_url,
+            {"password": "new-password"},
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            self.get_me(token).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        new_token = self.get_access_token("new-password")
+        self.assertEqual(self.get_me(new_token).status_code, 200)
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+            "django.contrib.auth.hashers.MD5PasswordHasher",
+        ]
+    )
+    def test_hash_upgrade_on_login_keeps_tokens_valid(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=make_password("password123", hasher="md5")
+        )
+
+        token = self.get_access_token()
+
+        self.assertEqual(self.get_me(token).status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+
+    def test_reports_check_the_current_staff_flag(self):
+        self.user.is_staff = True
+        self.user.save()
+        token = self.get_access_token()
+        report_url = reverse("reporting:report-daily")
+        response = self.client.get(
+            report_url, HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(
+            report_url, HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_rejects_revoked_and_stale_tokens(self):
+        refresh_token = self.get_tokens()["refresh"]
+        self.assertEqual(
+            self.refresh(refresh_token).status_code, status.HTTP_200_OK
+        )
+
+        self.user.set_password("new-password")
+        self.user.save()
+        self.assertEqual(
+            self.refresh(refresh_token).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+        self.user.is_staff = True
+        self.user.save()
+        refresh_token = self.get_tokens("new-password")["refresh"]
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(
+            self.refresh(refresh_token).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+        refresh_token = self.get_tokens("new-password")["refresh"]
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(
+            self.refresh(refresh_token).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
@@ -5,11 +5,20 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 
-from users.views import CreateUserView, UserManagerView
+from library_manage.async_views import route_reads
+from users.views import (
+    AsyncUserManagerView,
+    CreateUserView,
+    UserManagerView,
+)
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
-    path("me/", UserManagerView.as_view(), name="manage"),
+    path(
+        "me/",
+        route_reads(AsyncUserManagerView.as_view(), UserManagerView.as_view()),
+        name="manage",
+    ),
 
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),
@@ -1,5 +1,8 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from library_manage.async_views import AsyncAPIView
 
 from users.serializers import UserSerializer
 
@@ -14,3 +17,13 @@ class UserManagerView(generics.RetrieveUpdateAPIView):
 
     def get_object(self):
         return self.request.user
+
+
+class AsyncUserManagerView(AsyncAPIView):
+    """Async GET of ``UserManagerView``: the user is already loaded."""
+
+    serializer_class = UserSerializer
+    permission_classes = (IsAuthenticated,)
+
+    async def get(self, request, *args, **kwargs):
+        return Response(self.serializer_class(request.user).data)